@@ -0,0 +1,82 @@
+"""
+对比 get_list_value 与编译后的列表格式化函数在一页合成数据上的单元格耗时
+
+    python benchmarks/list_formatters.py [--rows 1000] [--repeat 5]
+"""
+import argparse
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from fairy_admin import FairyAdmin
+from fairy_admin.contrib.sqla import ModelView
+
+
+app = Flask(__name__)
+app.config.update(SECRET_KEY='benchmark', SQLALCHEMY_DATABASE_URI='sqlite://',
+                  SQLALCHEMY_TRACK_MODIFICATIONS=False)
+db = SQLAlchemy(app)
+
+
+class Item(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(32))
+    price = db.Column(db.Numeric(10, 2))
+    active = db.Column(db.Boolean)
+    status = db.Column(db.String(16))
+    created_at = db.Column(db.DateTime)
+
+
+class ItemView(ModelView):
+    column_list = ['id', 'name', 'price', 'active', 'status', 'created_at']
+    column_choices = {'status': [('new', 'New'), ('done', 'Done')]}
+    column_formatters = {'name': lambda v, c, m, p: m.name.upper()}
+
+
+admin = FairyAdmin(app, template_mode='layui')
+view = ItemView(Item, db.session)
+admin.add_view(view)
+
+
+def make_page(rows):
+    created_at = datetime.datetime(2020, 1, 1)
+    return [
+        Item(id=i, name='item {}'.format(i), price=i * 1.5, active=bool(i % 2),
+             status='new' if i % 3 else 'done', created_at=created_at)
+        for i in range(rows)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    page = make_page(args.rows)
+    columns = [c for c, _ in view._list_columns]
+
+    with app.test_request_context('/admin/item/ajax/'):
+        def get_list_value():
+            return [dict((c, view._repr(view.get_list_value(None, m, c))) for c in columns) for m in page]
+
+        formatters = view._get_list_formatters()
+
+        def compiled():
+            return [dict((c, f(m)) for c, f in formatters) for m in page]
+
+        assert get_list_value() == compiled()
+        cells = len(page) * len(columns)
+        for func in (get_list_value, compiled):
+            elapsed = min(timeit.repeat(func, number=1, repeat=args.repeat))
+            print('{:<16} {:.2f} us/cell'.format(func.__name__, elapsed / cells * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -181,9 +181,7 @@ class ActionsMixin(_ActionsMixin):
         display_checkbox = False
         result_actions = []
         action_list = self.actions or self._actions
-        for action_name in action_list:
-            if not self._can_do_action(action_name):
-                continue
+        for action_name in self._can_do_actions(action_list):
             action = self._actions_data[action_name]
             if not (action.position & POSITION_HEAD):
                 continue
@@ -193,41 +191,64 @@ class ActionsMixin(_ActionsMixin):
 
         return display_checkbox, result_actions
 
-    def _get_list_row_actions(self, item):
-        pk = self.get_pk_value(item)
-
+    def _get_row_action_names(self):
+        """
+        权限允许的行内动作，只与视图和用户相关，每个请求计算一次即可
+        """
         action_names = []
-        actions = {}
-
         action_list = self.row_actions or self._actions
         for action_name in action_list:
             action = self._actions_data[action_name]
             if not (action.position & POSITION_ROW):
                 continue
             action_names.append(action_name)
-            actions[action_name] = action
 
-        result_actions = []
-        action_list = self.row_actions or action_names
-        for action_name in action_list:
-            if not self._can_do_action(action_name):
-                continue
-            if not self._model_can_do_action(action_name, item) == False:
-                result_actions.append(actions[action_name])
+        return self._can_do_actions(action_names)
 
-        return result_actions
+    def _get_list_rows_actions(self, items, action_names=None):
+        """
+        按页获取行内动作，返回与 items 一一对应的动作列表
+        """
+        if action_names is None:
+            action_names = self._get_row_action_names()
+
+        result = []
+        for mask in self.model_can_do_actions(items, action_names):
+            row_actions = []
+            for action_name, allowed in zip(action_names, mask):
+                if allowed:
+                    row_actions.append(self._actions_data[action_name])
+            result.append(row_actions)
+        return result
+
+    def _get_permission_code(self, action):
+        permission_code = '{}.{}'.format(self.endpoint, action)
+        if isinstance(self.admin, TenantAdmin):
+            permission_code = '{}.{}'.format(self.admin.endpoint, permission_code)
+        return permission_code
+
+    def _can_do_actions(self, actions):
+        """
+        批量检查动作，返回允许的动作列表
+        """
+        if self.admin.rbac is not None:
+            permission_codes = [self._get_permission_code(action) for action in actions]
+            mask = self.admin.rbac.has_permissions(permission_codes)
+            actions = [action for action, allowed in zip(actions, mask) if allowed]
+        return [action for action in actions if self._can_do_view_action(action)]
 
     def _can_do_action(self, action):
         """
         检查是否支持批量动作，用于控制相应动作按钮
         """
         if self.admin.rbac is not None:
-            permission_code = '{}.{}'.format(self.endpoint, action)
-            if isinstance(self.admin, TenantAdmin):
-                permission_code = '{}.{}'.format(self.admin.endpoint, permission_code)
+            permission_code = self._get_permission_code(action)
             if not self.admin.rbac.has_permission(permission_code):
                 return False
 
+        return self._can_do_view_action(action)
+
+    def _can_do_view_action(self, action):
         if action == 'create':
             return self.can_create
         elif action == 'delete':
@@ -245,6 +266,16 @@ class ActionsMixin(_ActionsMixin):
         """
         return True
 
+    def model_can_do_actions(self, items, actions):
+        """
+        按页控制行内按钮显示，返回与 items 一一对应的布尔列表，每项与 actions 一一对应。
+        可重载为一次聚合查询，默认逐行调用 model_can_do_action
+        """
+        return [
+            [not self._model_can_do_action(action, item) == False for action in actions]
+            for item in items
+        ]
+
     def _model_can_do_action(self, action, item):
         """
         按行检查是否支持动作，用于控制行内相应动作按钮
@@ -352,5 +383,6 @@ class ActionsMixin(_ActionsMixin):
             )
         else:
             result = dict(code=0, msg='Success')
+            self.invalidate_cache()
         get_flashed_messages()
         return jsonify(result) 
@@ -1,4 +1,5 @@
 
+import click
 import os
 
 from flask import Blueprint
@@ -7,6 +8,7 @@ from flask.json import JSONEncoder as BaseEncoder
 from flask_admin import Admin
 from speaklater import _LazyString
 
+from .stats import ListStats, advise_indexes
 from .tenant import AdminMixin, AdminIndexView
 
 
@@ -29,6 +31,7 @@ class FairyAdmin(AdminMixin, Admin):
         super(FairyAdmin, self).__init__(*args, **kwargs)
         self._tenant_admins = []
         self.rbac = rbac
+        self.stats = None
 
     def init_app(self, app, *args, index_view=None, rbac=None, **kwargs):
         kwargs.update({
@@ -39,14 +42,22 @@ class FairyAdmin(AdminMixin, Admin):
         app.json_encoder = JSONEncoder
 
         self.rbac = rbac or self.rbac
+        stats_file = app.config.get('FAIRY_ADMIN_STATS_FILE')
+        if stats_file:
+            flush_interval = app.config.get('FAIRY_ADMIN_STATS_FLUSH_INTERVAL', 60)
+            self.stats = ListStats(stats_file, flush_interval=flush_interval)
         if 'fairy_admin' not in app.blueprints:
             template_folder = os.path.join('templates', self.template_mode)
             blueprint = Blueprint(
                 'fairy_admin',
                 __name__,
                 template_folder=template_folder,
-                static_folder='static'
+                static_folder='static',
+                cli_group='fairy_admin'
             )
+            blueprint.cli.short_help = 'Commands for admin maintenance.'
+            blueprint.cli.command('index_advice')(self.index_advice)
+            blueprint.cli.command('search_index')(self.search_index)
             app.register_blueprint(blueprint, url_prefix='/admin/fairy')
 
         for tenant_admin, _kwargs in self._tenant_admins:
@@ -58,6 +69,47 @@ class FairyAdmin(AdminMixin, Admin):
         if self.rbac is not None:
             self.rbac.init_admin(self)
 
+    @click.option('--min-count', default=1, help='Ignore combinations called fewer times.')
+    @click.option('--min-time', default=0.0, help='Ignore combinations faster than this on average, in milliseconds.')
+    def index_advice(self, min_count, min_time):
+        """
+        列出列表查询中较慢且过滤、排序字段缺少索引的组合
+        """
+        if self.stats is None:
+            click.echo('FAIRY_ADMIN_STATS_FILE is not configured.')
+            return
+
+        views = dict((view.endpoint, view) for view in self._get_all_views())
+
+        advices = advise_indexes(self.stats.get_data(), views, min_count, min_time / 1000.0)
+        for (endpoint, filters, sort, search), (count, total, max_elapsed), columns in advices:
+            click.echo('{} filters=[{}] sort={} search={}: {} calls, avg {:.1f}ms, max {:.1f}ms'.format(
+                endpoint, ', '.join(filters), sort, search, count,
+                total / count * 1000, max_elapsed * 1000))
+            for column in columns:
+                click.echo('  missing index: {}.{}'.format(column.table.name, column.name))
+        click.echo('{} combinations lacking index.'.format(len(advices)))
+
+    def search_index(self):
+        """
+        为开启全文检索的视图建立或重建全文索引
+        """
+        for view in self._get_all_views():
+            if not hasattr(view, 'get_search_backend'):
+                continue
+            backend = view.get_search_backend()
+            if backend is None:
+                continue
+            backend.create(view.session)
+            view.session.commit()
+            click.echo('{}: {}'.format(view.endpoint, backend.index_name))
+
+    def _get_all_views(self):
+        views = list(self._views)
+        for tenant_admin, _ in self._tenant_admins:
+            views.extend(tenant_admin._views)
+        return views
+
     def add_tenant_admin(self, tenant_admin, **kwargs):
         self._tenant_admins.append((tenant_admin, kwargs))
 
@@ -1,2 +1,7 @@
 
 ICON_TYPE_LAYUI = 'layui'
+
+COUNT_EXACT = 'exact'
+COUNT_CACHED = 'cached'
+COUNT_ESTIMATE = 'estimate'
+COUNT_HAS_MORE = 'has_more'
@@ -1,147 +1,335 @@
 import datetime
+import json
 
+from collections import OrderedDict
 from flask_admin.babel import lazy_gettext
 from flask_admin.model.filters import BaseFilter
+from sqlalchemy import bindparam, any_, cast, column, func, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import aliased, RelationshipProperty
+
+from fairy_admin.cache import TTLCache
 
 
 class FilterInList(BaseFilter):
-    def __init__(self, column, options):
+    def __init__(self, column, options=None):
+        """
+        options 为 None 时，选项为字段在列表数据中的不同取值
+        """
         super(FilterInList, self).__init__(column.key, options, None)
+        self.column = column
+
+    def get_options(self, view):
+        if self.options is None:
+            return view.load_distinct_options({self.name: self.column})[self.name]
+        return super(FilterInList, self).get_options(view)
 
     def operation(self):
         return lazy_gettext('in list')
 
 
+class InvalidFilter(ValueError):
+    pass
+
+
+def exclude_filter_field(filter_sos, field_name):
+    """
+    去掉 filterSos 中字段 field_name 上的条件，去掉后为空的分组一并去掉
+    """
+    result = []
+    for filter_so in filter_sos or []:
+        if not isinstance(filter_so, dict):
+            result.append(filter_so)
+        elif filter_so.get('mode') == 'group':
+            children = exclude_filter_field(filter_so.get('children'), field_name)
+            if children:
+                filter_so = dict(filter_so, children=children)
+                result.append(filter_so)
+        elif filter_so.get('field') != field_name:
+            result.append(filter_so)
+    return result
+
+
 class SQLAlchemyFilter(object):
-    def __init__(self, model, query=None):
+    """
+    将 soulTable 的 filterSos 转换为查询条件
+
+    filterSos 先编译为形状（结构、字段与操作符，取值替换为绑定参数名）与参数，
+    相同形状的查询条件只构造一次，之后的请求只绑定新的参数。
+
+    字段可以是经过关联字段的路径，如 `customer.city`：
+    一对一、多对一的关联每个路径只外连接一次，一对多、多对多的关联使用 EXISTS 子查询。
+    fields 为允许过滤的字段路径，其他字段及格式错误的 filterSos 抛出 InvalidFilter
+    """
+    cache = TTLCache(maxsize=1024)
+    in_threshold = 100
+    """
+    IN 列表超过该长度时，PostgreSQL 使用数组参数，SQLite 使用 json_each，SQL Server 使用 OPENJSON，
+    都只有一个绑定参数。其他数据库分段，参数总数不变，语句也随分段数变化，
+    列表长度受驱动的参数个数限制
+    """
+    in_chunk_size = 500
+
+    def __init__(self, model, query=None, fields=None):
         self.model = model
         self.query = query or model.query
+        self.fields = fields
+        self.joins = OrderedDict()
 
     def apply(self, filter_sos):
-        conditions = self.build_children(filter_sos)
-        return self.query.filter(conditions)
+        shape, params = self.compile(filter_sos)
+        key = (self.model, shape)
+        cached = self.cache.get(key)
+        if cached is None:
+            self.joins = OrderedDict()
+            try:
+                cached = (self.build_children(shape), list(self.joins.values()))
+            except AttributeError as ex:
+                raise InvalidFilter(str(ex))
+            self.cache.set(key, cached)
 
-    def build_children(self, children):
-        conditions = None
+        conditions, joins = cached
+        if conditions is None:
+            return self.query
+        query = self.query
+        for target, onclause in joins:
+            query = query.outerjoin(target, onclause)
+        return query.filter(conditions).params(**params)
+
+    def compile(self, filter_sos):
+        """
+        :return: (shape, params)
+        """
+        params = {}
+        try:
+            shape = self.compile_children(filter_sos, params)
+        except (KeyError, TypeError, AttributeError, ValueError) as ex:
+            raise InvalidFilter(str(ex))
+        return shape, params
+
+    def compile_children(self, children, params):
+        shape = []
         for filter_so in children:
-            prefix, condition = self.build_filter_so(filter_so)
-            if condition is None:
-                continue
-            if conditions is None:
-                conditions = condition
-            elif prefix == 'and':
-                conditions = conditions & condition
-            elif prefix == 'or':
-                conditions = conditions | condition
-            else:
-                assert False, 'Invalid prefix {}'.format(prefix)
-        return conditions
+            item = self.compile_filter_so(filter_so, params)
+            if item is not None:
+                shape.append(item)
+        return tuple(shape)
 
-    def build_filter_so(self, filter_so):
+    def compile_filter_so(self, filter_so, params):
         prefix = filter_so['prefix']
         mode = filter_so['mode']
+        if prefix not in ('and', 'or'):
+            raise InvalidFilter('Invalid prefix {}'.format(prefix))
+        if mode != 'group':
+            self.check_field(filter_so['field'])
         if mode == 'condition':
-            return prefix, self.build_filter_so_condition(filter_so)
+            return self.compile_filter_so_condition(prefix, filter_so, params)
         elif mode == 'group':
-            return prefix, self.build_filter_so_children(filter_so)
+            children = self.compile_children(filter_so['children'], params)
+            return (mode, prefix, children) if children else None
         elif mode == 'in':
-            return prefix, self.build_filter_so_in(filter_so)
+            return self.compile_filter_so_in(prefix, filter_so, params)
         elif mode == 'date':
-            return prefix, self.build_filter_so_date(filter_so)
+            return self.compile_filter_so_date(prefix, filter_so, params)
         else:
-            assert False, 'Unsupported mode {}'.format(mode)
+            raise InvalidFilter('Unsupported mode {}'.format(mode))
 
-    def build_filter_so_condition(self, filter_so):
-        field_name = filter_so['field']
-        field = self.get_field(field_name)
+    def compile_filter_so_condition(self, prefix, filter_so, params):
         type = filter_so['type']
-        value = filter_so['value']
-        if type == 'eq':
-            condition = field == value
-        elif type == 'ne':
-            condition = field != value
-        elif type == 'gt':
-            condition = field > value
-        elif type == 'ge':
-            condition = field >= value
-        elif type == 'lt':
-            condition = field < value
-        elif type == 'le':
-            condition = field <= value
-        elif type == 'contain':
-            value = '%{}%'.format(value)
-            condition = field.like(value)
-        elif type == 'notContain':
-            value = '%{}%'.format(value)
-            condition = ~field.like(value)
+        value = filter_so.get('value')
+        if type in ('null', 'notNull'):
+            name = None
+        elif type in ('eq', 'ne', 'gt', 'ge', 'lt', 'le'):
+            name = self.add_param(params, value)
+        elif type == 'contain' or type == 'notContain':
+            name = self.add_param(params, '%{}%'.format(value))
         elif type == 'start':
-            value = '{}%'.format(value)
-            condition = field.like(value)
+            name = self.add_param(params, '{}%'.format(value))
         elif type == 'end':
-            value = '%{}'.format(value)
-            condition = field.like(value)
-        elif type == 'null':
-            condition = field is None
-        elif type == 'notNull':
-            condition = field is not None
+            name = self.add_param(params, '%{}'.format(value))
         else:
-            assert False, 'Unsupported condition type {}'.format(type)
-        return condition
-
-    def build_filter_so_children(self, filter_so):
-        children = filter_so['children']
-        return self.build_children(children)
-
-    def build_filter_so_in(self, filter_so):
-        field_name = filter_so['field']
-        field = self.get_field(field_name)
-        values = filter_so['values']
-        return field.in_(values)
-
-    def build_filter_so_date(self, filter_so):
-        field_name = filter_so['field']
-        field = self.get_field(field_name)
+            raise InvalidFilter('Unsupported condition type {}'.format(type))
+        return ('condition', prefix, filter_so['field'], type, name)
+
+    def compile_filter_so_in(self, prefix, filter_so, params):
+        """
+        短列表使用 expanding 参数，长列表按数据库选择只有一个参数的写法，
+        不支持的数据库分段
+        """
+        values = list(filter_so['values'])
+        method = 'expanding'
+        if len(values) > self.in_threshold:
+            dialect = self.get_dialect()
+            if dialect == 'postgresql':
+                method = 'array'
+            elif dialect in ('sqlite', 'mssql'):
+                method = 'json' if dialect == 'sqlite' else 'openjson'
+                values = json.dumps(values)
+            else:
+                chunks = [values[i:i + self.in_chunk_size]
+                          for i in range(0, len(values), self.in_chunk_size)]
+                names = tuple(self.add_param(params, chunk) for chunk in chunks)
+                return ('in', prefix, filter_so['field'], names, 'chunks')
+        name = self.add_param(params, values)
+        return ('in', prefix, filter_so['field'], name, method)
+
+    def check_field(self, field_name):
+        if self.fields is not None and field_name not in self.fields:
+            raise InvalidFilter('Field {} is not filterable'.format(field_name))
+
+    def get_dialect(self):
+        session = self.query.session
+        return session.get_bind(mapper=self.model.__mapper__).dialect.name
+
+    def compile_filter_so_date(self, prefix, filter_so, params):
         type = filter_so['type']
-        value = filter_so['value']
+        now = datetime.datetime.now()
+        today = datetime.datetime(now.year, now.month, now.day)
         if type == 'yesterday':
-            now = datetime.datetime.now()
-            today = datetime.datetime(now.year, now.month, now.day)
-            yestoday = today - datetime.timedelta(days=1)
-            return field >= yestoday & field < today
+            start, end = today - datetime.timedelta(days=1), today
         elif type == 'thisWeek':
-            now = datetime.datetime.now()
-            today = datetime.datetime(now.year, now.month, now.day)
-            sunday = today - datetime.timedelta(days=dt.weekday())
-            next_sunday = sunday + datetime.timedelta(days=7)
-            return field >= sunday & field < next_sunday
+            start = today - datetime.timedelta(days=today.weekday())
+            end = start + datetime.timedelta(days=7)
         elif type == 'lastWeek':
-            now = datetime.datetime.now()
-            today = datetime.datetime(now.year, now.month, now.day)
-            sunday = today - datetime.timedelta(days=dt.weekday())
-            prev_sunday = sunday - datetime.timedelta(days=7)
-            return field >= prev_sunday & field < sunday
+            end = today - datetime.timedelta(days=today.weekday())
+            start = end - datetime.timedelta(days=7)
         elif type == 'thisMonth':
-            now = datetime.datetime.now()
-            month_1st = datetime.datetime(now.year, now.month, 1)
-            next_month_1st = datetime.datetime(now.year + int(now.month / 12), now.month % 12 + 1, 1)
-            print(month_1st, next_month_1st)
-            return field >= month_1st & field < next_month_1st
+            start = datetime.datetime(now.year, now.month, 1)
+            end = datetime.datetime(now.year + int(now.month / 12), now.month % 12 + 1, 1)
         elif type == 'thisYear':
-            now = datetime.datetime.now()
-            year_1st = datetime.datetime(now.year, 1, 1)
-            next_year_1st = datetime.datetime(now.year + 1, 1, 1)
-            return field >= year_1st & field < next_year_1st
+            start = datetime.datetime(now.year, 1, 1)
+            end = datetime.datetime(now.year + 1, 1, 1)
         elif type == 'specific':
-            value = filter_so['value']
-            # TODO finish fmt
-            value = datetime.datetime.strptime(value, 'fmt')
-            date = datetime.datetime(value.year, value.month, value.day)
-            tomorrow = date + datetime.timedelta(days=1)
-            return field >= date & field < tomorrow
+            value = datetime.datetime.strptime(filter_so['value'][:10], '%Y-%m-%d')
+            start, end = value, value + datetime.timedelta(days=1)
         elif type == 'all':
             return None
         else:
-            assert False, 'Unsupported date type {}'.format(type)
+            raise InvalidFilter('Unsupported date type {}'.format(type))
+        names = (self.add_param(params, start), self.add_param(params, end))
+        return ('date', prefix, filter_so['field'], names)
+
+    def add_param(self, params, value):
+        name = 'flt_{}'.format(len(params))
+        params[name] = value
+        return name
+
+    def build_children(self, shape):
+        conditions = None
+        for item in shape:
+            prefix, condition = self.build_filter_so(item)
+            if conditions is None:
+                conditions = condition
+            elif prefix == 'and':
+                conditions = conditions & condition
+            else:
+                conditions = conditions | condition
+        return conditions
+
+    def build_filter_so(self, item):
+        mode, prefix = item[0], item[1]
+        if mode == 'condition':
+            return prefix, self.build_filter_so_condition(*item[2:])
+        elif mode == 'group':
+            return prefix, self.build_children(item[2])
+        elif mode == 'in':
+            return prefix, self.build_filter_so_in(*item[2:])
+        else:
+            return prefix, self.build_filter_so_date(*item[2:])
+
+    def build_filter_so_condition(self, field_name, type, name):
+        field, wrap = self.resolve_field(field_name)
+        return wrap(self._build_condition(field, type, name))
+
+    def _build_condition(self, field, type, name):
+        if type == 'null':
+            return field.is_(None)
+        elif type == 'notNull':
+            return field.isnot(None)
+
+        value = bindparam(name)
+        if type == 'eq':
+            return field == value
+        elif type == 'ne':
+            return field != value
+        elif type == 'gt':
+            return field > value
+        elif type == 'ge':
+            return field >= value
+        elif type == 'lt':
+            return field < value
+        elif type == 'le':
+            return field <= value
+        elif type == 'notContain':
+            return ~field.like(value)
+        else:
+            return field.like(value)
+
+    def build_filter_so_in(self, field_name, name, method):
+        field, wrap = self.resolve_field(field_name)
+        if method == 'array':
+            # soulTable 传来的取值是字符串，在数据库中转换为字段类型的数组
+            condition = field == any_(cast(bindparam(name), ARRAY(field.type)))
+        elif method == 'json':
+            values = select([column('value')]).select_from(func.json_each(bindparam(name)))
+            condition = field.in_(values)
+        elif method == 'openjson':
+            values = select([column('value')]).select_from(func.openjson(bindparam(name)))
+            condition = field.in_(values)
+        elif method == 'chunks':
+            condition = or_(*[field.in_(bindparam(n, expanding=True)) for n in name])
+        else:
+            condition = field.in_(bindparam(name, expanding=True))
+        return wrap(condition)
+
+    def build_filter_so_date(self, field_name, names):
+        field, wrap = self.resolve_field(field_name)
+        start, end = names
+        return wrap((field >= bindparam(start)) & (field < bindparam(end)))
+
+    def resolve_field(self, field_name):
+        """
+        解析字段路径，返回 (field, wrap)，wrap 将字段上的条件转换为根模型上的条件
+        """
+        names = field_name.split('.')
+        entity = self.model
+        path = []
+        for idx, name in enumerate(names[:-1]):
+            prop = self._get_relationship(entity, name)
+            path.append(name)
+            if prop.uselist:
+                attr = getattr(entity, name)
+                field, wrap = self._resolve_exists(prop.mapper.class_, names[idx + 1:])
+                return field, lambda condition: attr.any(wrap(condition))
+            entity = self._join('.'.join(path), entity, name, prop)
+        return self.get_field(names[-1], entity), lambda condition: condition
+
+    def _resolve_exists(self, model, names):
+        if len(names) == 1:
+            return self.get_field(names[0], model), lambda condition: condition
+        prop = self._get_relationship(model, names[0])
+        attr = getattr(model, names[0])
+        field, wrap = self._resolve_exists(prop.mapper.class_, names[1:])
+        if prop.uselist:
+            return field, lambda condition: attr.any(wrap(condition))
+        return field, lambda condition: attr.has(wrap(condition))
+
+    def _get_relationship(self, entity, name):
+        prop = getattr(entity, name).property
+        if not isinstance(prop, RelationshipProperty):
+            raise InvalidFilter('Invalid relationship {}'.format(name))
+        return prop
+
+    def _join(self, path, entity, name, prop):
+        """
+        外连接关联模型的别名，同一路径只连接一次
+        """
+        join = self.joins.get(path)
+        if join is None:
+            join = self.joins[path] = (aliased(prop.mapper.class_), getattr(entity, name))
+        return join[0]
 
-    def get_field(self, field_name):
-        return getattr(self.model, field_name)
+    def get_field(self, field_name, entity=None):
+        if entity is None:
+            entity = self.model
+        return getattr(entity, field_name)
@@ -0,0 +1,107 @@
+import base64
+import decimal
+import json
+
+from datetime import datetime, date
+from sqlalchemy import and_, or_
+
+
+CURSOR_NEXT = 'next'
+CURSOR_PREV = 'prev'
+
+DATETIME_FORMATS = ('%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S')
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.strftime(DATE_FORMAT)
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def _load_value(field, value):
+    if not isinstance(value, str):
+        return value
+    try:
+        python_type = field.type.python_type
+    except (AttributeError, NotImplementedError):
+        return value
+
+    if python_type is datetime:
+        # isoformat() 对带时区的时间会加上 +00:00 这样的偏移
+        fromisoformat = getattr(datetime, 'fromisoformat', None)
+        if fromisoformat is not None:
+            try:
+                return fromisoformat(value)
+            except ValueError:
+                raise InvalidCursor(value)
+        for fmt in DATETIME_FORMATS:
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                pass
+        raise InvalidCursor(value)
+    if python_type is date:
+        try:
+            return datetime.strptime(value, DATE_FORMAT).date()
+        except ValueError:
+            raise InvalidCursor(value)
+    if python_type is decimal.Decimal:
+        try:
+            return decimal.Decimal(value)
+        except decimal.InvalidOperation:
+            raise InvalidCursor(value)
+    return value
+
+
+def _get_sort(fields, descending):
+    return [[f.key for f in fields], bool(descending)]
+
+
+def encode_cursor(direction, key, fields, descending):
+    """
+    将翻页方向、排序字段与方向、排序键编码为不透明的游标字符串
+    """
+    data = [direction, _get_sort(fields, descending), [_dump_value(v) for v in key]]
+    data = json.dumps(data, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, fields, descending):
+    """
+    解析游标，返回 (direction, key)，fields 为排序键对应的模型字段。
+    游标生成时的排序与当前排序不一致时视为无效
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        direction, sort, key = json.loads(data.decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor(cursor)
+
+    if direction not in (CURSOR_NEXT, CURSOR_PREV) or sort != _get_sort(fields, descending):
+        raise InvalidCursor(cursor)
+    if not isinstance(key, list) or len(key) != len(fields):
+        raise InvalidCursor(cursor)
+    return direction, tuple(_load_value(f, v) for f, v in zip(fields, key))
+
+
+def keyset_condition(fields, key, descending):
+    """
+    构造 `(f1, f2, ...) > (v1, v2, ...)` 的可移植写法，descending 时为 `<`
+    """
+    conditions = []
+    for idx in range(len(fields) - 1, -1, -1):
+        field, value = fields[idx], key[idx]
+        condition = field < value if descending else field > value
+        if conditions:
+            condition = or_(condition, and_(field == value, conditions[-1]))
+        conditions.append(condition)
+    return conditions[-1]
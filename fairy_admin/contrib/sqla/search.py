@@ -0,0 +1,195 @@
+from sqlalchemy import Index, Integer, String, cast, desc, func, inspect, literal_column, table, column, text
+
+
+class SearchBackend(object):
+    """
+    全文检索后端，为模型的可搜索字段建立并查询数据库的全文索引
+    """
+    min_term_length = 1
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = columns
+        self.table = model.__table__
+        self.pk = model.__mapper__.primary_key[0]
+        self.index_name = '{}_fts'.format(self.table.name)
+        self._ready = False
+
+    def is_ready(self, session):
+        """
+        全文索引是否已建立，建立后缓存结果
+        """
+        if not self._ready:
+            self._ready = self.check(session)
+        return self._ready
+
+    def accepts(self, search):
+        """
+        搜索词是否可以用全文索引查询，否则按 LIKE 搜索
+        """
+        terms = search.split()
+        return bool(terms) and all(len(term) >= self.min_term_length for term in terms)
+
+    def check(self, session):
+        return True
+
+    def create(self, session):
+        """
+        建立或重建全文索引
+        """
+        raise NotImplementedError('Please implement create method')
+
+    def apply(self, query, search):
+        """
+        :return: 过滤出匹配记录的查询
+        """
+        raise NotImplementedError('Please implement apply method')
+
+    def rank(self, search):
+        """
+        :return: 按相关度排序的表达式
+        """
+        raise NotImplementedError('Please implement rank method')
+
+
+def _quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    SQLite FTS5 外部内容表，trigram 分词与 LIKE 一样支持任意子串（包括中文），由触发器同步
+    """
+    min_term_length = 3
+
+    def __init__(self, model, columns):
+        super(SQLiteSearchBackend, self).__init__(model, columns)
+        self.fts = table(self.index_name, column('rowid'), column('rank'))
+        self.fts_column = literal_column(_quote(self.index_name))
+
+    def check(self, session):
+        stmt = text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name")
+        return session.execute(stmt, {'name': self.index_name}).scalar() is not None
+
+    def create(self, session):
+        fts = _quote(self.index_name)
+        source = _quote(self.table.name)
+        pk = _quote(self.pk.name)
+        names = ', '.join(_quote(c.name) for c in self.columns)
+        new_values = ', '.join('new.{}'.format(_quote(c.name)) for c in self.columns)
+        old_values = ', '.join('old.{}'.format(_quote(c.name)) for c in self.columns)
+        delete = "INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.{pk}, {old});"
+        insert = "INSERT INTO {fts}(rowid, {names}) VALUES (new.{pk}, {new});"
+        # 可搜索字段变化后旧触发器的字段与新表不一致，和表一起重建
+        statements = [
+            'DROP TRIGGER IF EXISTS {ai}',
+            'DROP TRIGGER IF EXISTS {ad}',
+            'DROP TRIGGER IF EXISTS {au}',
+            'DROP TABLE IF EXISTS {fts}',
+            "CREATE VIRTUAL TABLE {fts} USING fts5({names}, content={source_name}, "
+            "content_rowid={pk_name}, tokenize='trigram')",
+            'CREATE TRIGGER {ai} AFTER INSERT ON {source} BEGIN ' + insert + ' END',
+            'CREATE TRIGGER {ad} AFTER DELETE ON {source} BEGIN ' + delete + ' END',
+            'CREATE TRIGGER {au} AFTER UPDATE ON {source} BEGIN ' + delete + ' ' + insert + ' END',
+            "INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+        for statement in statements:
+            session.execute(text(statement.format(
+                fts=fts, source=source, pk=pk, names=names, new=new_values, old=old_values,
+                source_name="'{}'".format(self.table.name), pk_name="'{}'".format(self.pk.name),
+                ai=_quote(self.index_name + '_ai'),
+                ad=_quote(self.index_name + '_ad'),
+                au=_quote(self.index_name + '_au'),
+            )))
+        self._ready = True
+
+    def _match(self, search):
+        return ' '.join('"{}"'.format(term.replace('"', '""')) for term in search.split())
+
+    def apply(self, query, search):
+        query = query.join(self.fts, self.fts.c.rowid == self.pk)
+        return query.filter(self.fts_column.match(self._match(search)))
+
+    def rank(self, search):
+        return self.fts.c.rank
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """
+    PostgreSQL tsvector 表达式上的 GIN 索引
+    """
+    def __init__(self, model, columns, config='simple'):
+        super(PostgreSQLSearchBackend, self).__init__(model, columns)
+        self.config = config
+        document = None
+        for c in columns:
+            value = func.coalesce(cast(c, String), '')
+            document = value if document is None else document + ' ' + value
+        self.document = func.to_tsvector(config, document)
+
+    def _query(self, search):
+        return func.plainto_tsquery(self.config, search)
+
+    def check(self, session):
+        # 反射不支持表达式索引，直接查询 pg_indexes
+        stmt = text('SELECT 1 FROM pg_indexes WHERE indexname = :name AND tablename = :table '
+                    'AND schemaname = COALESCE(:schema, current_schema())')
+        params = {'name': self.index_name, 'table': self.table.name, 'schema': self.table.schema}
+        return session.execute(stmt, params).scalar() is not None
+
+    def create(self, session):
+        bind = session.get_bind(mapper=self.model.__mapper__)
+        index = Index(self.index_name, self.document, postgresql_using='gin')
+        index.create(bind, checkfirst=True)
+        self._ready = True
+
+    def apply(self, query, search):
+        return query.filter(self.document.op('@@')(self._query(search)))
+
+    def rank(self, search):
+        return desc(func.ts_rank(self.document, self._query(search)))
+
+
+class MySQLSearchBackend(SearchBackend):
+    """
+    MySQL FULLTEXT 索引，以 NATURAL LANGUAGE MODE 查询
+    """
+    def _match(self, search):
+        names = ', '.join('`{}`.`{}`'.format(self.table.name, c.name) for c in self.columns)
+        stmt = 'MATCH ({}) AGAINST (:fts_search IN NATURAL LANGUAGE MODE)'.format(names)
+        return text(stmt).bindparams(fts_search=search)
+
+    def check(self, session):
+        bind = session.get_bind(mapper=self.model.__mapper__)
+        indexes = inspect(bind).get_indexes(self.table.name, schema=self.table.schema)
+        return any(index['name'] == self.index_name for index in indexes)
+
+    def create(self, session):
+        bind = session.get_bind(mapper=self.model.__mapper__)
+        index = Index(self.index_name, *self.columns, mysql_prefix='FULLTEXT')
+        index.create(bind, checkfirst=True)
+        self._ready = True
+
+    def apply(self, query, search):
+        return query.filter(self._match(search))
+
+    def rank(self, search):
+        return desc(self._match(search))
+
+
+def create_search_backend(dialect, model, columns):
+    """
+    按数据库选择全文检索后端，不支持时返回 None
+    """
+    if not columns or getattr(model, '__table__', None) is None:
+        return None
+    pk_columns = model.__mapper__.primary_key
+    if dialect == 'sqlite':
+        if len(pk_columns) != 1 or not isinstance(pk_columns[0].type, Integer):
+            return None
+        return SQLiteSearchBackend(model, columns)
+    if dialect == 'postgresql':
+        return PostgreSQLSearchBackend(model, columns)
+    if dialect == 'mysql':
+        return MySQLSearchBackend(model, columns)
+    return None
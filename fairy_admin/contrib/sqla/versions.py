@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Table
+
+
+VERSION_TABLE = 'admin_data_version'
+
+
+def get_version_table(metadata):
+    """
+    各模型数据的版本号表，定义在模型的 metadata 上，随 db.create_all() 创建
+    """
+    table = metadata.tables.get(VERSION_TABLE)
+    if table is None:
+        table = Table(
+            VERSION_TABLE, metadata,
+            Column('name', String(255), primary_key=True),
+            Column('version', Integer, nullable=False, default=0)
+        )
+    return table
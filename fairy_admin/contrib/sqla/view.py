@@ -1,17 +1,39 @@
 
-from flask import g, request, url_for, redirect
-from flask_admin import expose
+import decimal
+import json
+
+from collections import OrderedDict
+
+from flask import g, request, url_for, redirect, jsonify, abort
+from flask_admin import expose, tools
+from flask_admin.babel import gettext
 from flask_admin.contrib.sqla import ModelView as _ModelView
+from flask_admin.contrib.sqla.tools import get_query_for_ids
 from flask_admin.model.helpers import get_mdict_item_or_list
 from flask_admin.helpers import get_redirect_target
 from flask_sqlalchemy import Model
-from sqlalchemy import func
+from sqlalchemy import func, desc, text, cast, literal, select, String
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload, subqueryload, load_only
+from sqlalchemy.orm import ColumnProperty, RelationshipProperty
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 
+from fairy_admin.cache import TTLCache
+from fairy_admin.consts import COUNT_CACHED, COUNT_ESTIMATE, COUNT_HAS_MORE
 from fairy_admin.model import BaseModelViewMixin
 
-from .filters import SQLAlchemyFilter
+from .filters import InvalidFilter, SQLAlchemyFilter, FilterInList, exclude_filter_field
 from .form import AdminModelConverter
+from .search import create_search_backend
+from .keyset import CURSOR_NEXT, CURSOR_PREV, encode_cursor, decode_cursor, keyset_condition
+from .versions import get_version_table
+
+
+LOADERS = {
+    'joined': joinedload,
+    'selectin': selectinload,
+    'subquery': subqueryload,
+}
 
 
 class Call(object):
@@ -31,8 +53,73 @@ class ModelView(BaseModelViewMixin, _ModelView):
     model_form_converter = AdminModelConverter
     model_relationship_views = []
 
+    column_list_load_only = False
+    """
+    load only primary key, listed, exported and sortable columns for model list,
+    large columns not in model list are not fetched. Other columns read by
+    column_formatters or model_can_do_action are loaded by one query per row,
+    list them in column_extra_load_list
+    """
+    column_extra_load_list = []
+    """
+    extra columns to load for model list, e.g. columns read by column_formatters
+    or model_can_do_action
+    """
+    column_list_rows = False
+    """
+    fetch plain row tuples instead of model instances for model list,
+    for read-only views whose listed columns are all table columns
+    """
+    column_filter_paths = []
+    """
+    extra field paths allowed in table header filters, e.g. `customer.city`,
+    listed columns and column_filters are always allowed
+    """
+    filter_options_limit = 1000
+    """
+    max number of distinct values loaded as options of FilterInList without options
+    """
+    facet_limit = 20
+    """
+    default number of most frequent values of each column returned by facets endpoint
+    """
+    filter_facets = False
+    """
+    serve values of table header filters from the facets query,
+    values follow current search and filters of model list
+    """
+    full_text_search = False
+    """
+    search model list with full-text index of the database instead of LIKE,
+    results are ranked by relevance when no sort column is selected.
+    Searchable columns must be columns of the model table, create the index
+    with `flask fairy_admin search_index`. Falls back to LIKE when the database
+    is not supported, the index is missing or the search term is too short.
+    SQLite matches substrings like LIKE, PostgreSQL and MySQL match whole words
+    """
+    column_relationship_loading = {}
+    """
+    loading strategy of relationship columns in model list and details:
+    'joined', 'selectin', 'subquery' or 'lazy', keyed by column name or path,
+    e.g. {'customer': 'joined', 'tags': 'selectin'}.
+    By default many-to-one relationships are joined, others are loaded by selectin
+    """
+
     def __init__(self, ModelClass, session, *args, **kwargs):
         super(ModelView, self).__init__(ModelClass, session, *args, **kwargs)
+        if self.keyset_pagination and isinstance(self._primary_key, tuple):
+            print('Warning: keyset pagination of {} requires a single primary key'.format(ModelClass.__name__))
+            self.keyset_pagination = False
+        self._count_cache = TTLCache(ttl=self.count_cache_ttl)
+        self._search_backend = None
+        self._version_table = None
+        self._has_version_table = None
+        if getattr(ModelClass, 'metadata', None) is not None:
+            # 所有视图的数据变更都递增共享的版本号，使其他视图、进程缓存的列表数据失效
+            self._version_table = get_version_table(ModelClass.metadata)
+        for name in self._lazy_columns:
+            field_name = '{}.{}'.format(ModelClass.__name__, name)
+            print('Warning: relationship column {} will be lazy loaded for each row'.format(field_name))
         for key in self.model_relationship_views:
             field = getattr(self.model, key)
             if not isinstance(field, InstrumentedAttribute):
@@ -48,14 +135,119 @@ class ModelView(BaseModelViewMixin, _ModelView):
     def _repr(self, value):
         return repr(value) if isinstance(value, Model) else value
 
+    def _refresh_cache(self):
+        super(ModelView, self)._refresh_cache()
+        self._list_load_columns = self._get_list_load_columns()
+
+        list_columns = [c for c, _ in self._list_columns]
+        details_columns = [c for c, _ in getattr(self, '_details_columns', None) or []]
+        self._list_loader_options, lazy_columns, self._list_yield_per = self._get_loader_options(list_columns)
+        self._details_loader_options, details_lazy_columns, _ = self._get_loader_options(details_columns)
+        self._lazy_columns = lazy_columns + [c for c in details_lazy_columns if c not in lazy_columns]
+
+    def _get_loader_options(self, columns):
+        """
+        为字段中的关联字段生成预加载选项，返回 (options, lazy_columns, yield_per)，
+        集合以 joined、subquery 预加载时不能使用 yield_per 分批读取
+        """
+        select_related = None
+        if self.column_select_related_list:
+            select_related = [getattr(c, 'key', c) for c in self.column_select_related_list]
+
+        options = {}
+        lazy_columns = []
+        yield_per = True
+        for column in columns:
+            model = self.model
+            option = None
+            path = []
+            for name in column.split('.'):
+                prop = model.__mapper__.attrs.get(name)
+                if not isinstance(prop, RelationshipProperty):
+                    break
+                path.append(name)
+                key = '.'.join(path)
+
+                strategy = self.column_relationship_loading.get(key)
+                if strategy is None:
+                    if prop.lazy == 'dynamic':
+                        strategy = 'lazy'
+                    elif select_related is not None and path[0] not in select_related:
+                        strategy = 'lazy'
+                    elif select_related is None and not self.column_auto_select_related:
+                        strategy = 'lazy'
+                    elif prop.direction.name == 'MANYTOONE':
+                        strategy = 'joined'
+                    else:
+                        strategy = 'selectin'
+                    if strategy == 'lazy':
+                        lazy_columns.append(column)
+                if strategy == 'lazy':
+                    break
+
+                if strategy == 'subquery' or (strategy == 'joined' and prop.uselist):
+                    yield_per = False
+                attr = getattr(model, name)
+                if option is None:
+                    option = LOADERS[strategy](attr)
+                else:
+                    option = getattr(option, '{}load'.format(strategy))(attr)
+                options[key] = option
+                model = prop.mapper.class_
+
+        return list(options.values()), lazy_columns, yield_per
+
+    def _get_list_load_columns(self):
+        """
+        列表查询需要加载的字段名，无法确定时返回 None，加载完整模型
+        """
+        if not self.column_list_load_only and not self.column_list_rows:
+            return None
+
+        mapper = self.model.__mapper__
+        names = [c for c, _ in self._list_columns]
+        names.extend(c for c, _ in getattr(self, '_export_columns', None) or [])
+        names.extend(self.column_extra_load_list or [])
+
+        columns = [mapper.get_property_by_column(c).key for c in mapper.primary_key]
+        for name in names:
+            if '.' in name:
+                name = name.split('.', 1)[0]
+            prop = mapper.attrs.get(name)
+            if isinstance(prop, ColumnProperty):
+                keys = [name]
+            elif isinstance(prop, RelationshipProperty) and not self.column_list_rows:
+                keys = [mapper.get_property_by_column(c).key for c in prop.local_columns]
+            else:
+                if self.column_list_rows:
+                    print('Warning: column {} of {} can not be fetched as row'.format(name, self.model.__name__))
+                    self.column_list_rows = False
+                return None
+            columns.extend(k for k in keys if k not in columns)
+
+        for field in self._sortable_columns.values():
+            key = getattr(field, 'key', None)
+            if isinstance(field, InstrumentedAttribute) and isinstance(mapper.attrs.get(key), ColumnProperty):
+                if key not in columns:
+                    columns.append(key)
+        return columns
+
     def _apply_filters(self, query, count_query, joins, count_joins, filters):
         """
         适配LayUI表格扩展：soulTable的filter功能
         """
         if self.admin.template_mode == 'layui':
-            sqla_filter = SQLAlchemyFilter(self.model, query=query)
-            query = sqla_filter.apply(filters)
-            count_query = query.with_entities(func.count('*'))
+            sqla_filter = SQLAlchemyFilter(self.model, query=query, fields=self.get_filter_paths())
+            try:
+                filtered = sqla_filter.apply(filters)
+            except InvalidFilter:
+                abort(400)
+            if filtered is not query:
+                query = filtered
+                if count_query is not None:
+                    # 统计主键，保证关联的 EXISTS 子查询不会把模型表从 FROM 中去掉
+                    pk = self.model.__mapper__.primary_key[0]
+                    count_query = query.with_entities(func.count(pk))
             return query, count_query, joins, count_joins
         return super(ModelView, self).apply_filters(
             query,
@@ -65,6 +257,582 @@ class ModelView(BaseModelViewMixin, _ModelView):
             filters
         )
 
+    def get_filter_paths(self):
+        """
+        表头过滤允许的字段路径：列表字段、column_filters 及 column_filter_paths
+        """
+        paths = set(c for c, _ in self._list_columns)
+        paths.update(self._filters or [])
+        paths.update(self.column_filter_paths or [])
+        return paths
+
+    def get_search_backend(self):
+        """
+        全文检索后端，未开启或不支持时返回 None
+        """
+        if not self.full_text_search or not self._search_supported:
+            return None
+        if self._search_backend is None:
+            columns = [field for field, path in self._search_fields if not path]
+            backend = None
+            if len(columns) == len(self._search_fields):
+                dialect = self.session.get_bind(mapper=self.model.__mapper__).dialect.name
+                backend = create_search_backend(dialect, self.model, columns)
+            if backend is None:
+                print('Warning: full-text search of {} is not supported, use LIKE'.format(self.model.__name__))
+            self._search_backend = backend or False
+        return self._search_backend or None
+
+    def _get_ready_search_backend(self, search):
+        backend = self.get_search_backend()
+        if backend is None or not backend.accepts(search) or not backend.is_ready(self.session):
+            return None
+        return backend
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        """
+        开启全文检索时使用全文索引，否则按 LIKE 搜索
+        """
+        backend = self._get_ready_search_backend(search)
+        if backend is None:
+            return super(ModelView, self)._apply_search(query, count_query, joins, count_joins, search)
+
+        query = backend.apply(query, search)
+        if count_query is not None:
+            count_query = backend.apply(count_query, search)
+        return query, count_query, joins, count_joins
+
+    def _build_list_query(self, search, filters, count=True, load=True):
+        """
+        构造已应用搜索与过滤条件的列表查询，返回 (query, count_query, joins)。
+        load 为 False 时不设置加载选项，用于 with_entities 的统计查询
+        """
+        joins = {}
+        count_joins = {}
+
+        query = self.get_query()
+        count_query = None
+        if count and not self.simple_list_pager:
+            count_query = self.get_count_query()
+
+        # Ignore eager-loaded relations (prevent unnecessary joins)
+        if hasattr(query, '_join_entities'):
+            for entity in query._join_entities:
+                for table in entity.tables:
+                    joins[table] = None
+
+        if self._search_supported and search:
+            query, count_query, joins, count_joins = self._apply_search(
+                query,
+                count_query,
+                joins,
+                count_joins,
+                search
+            )
+
+        if filters and self._filters:
+            query, count_query, joins, count_joins = self._apply_filters(
+                query,
+                count_query,
+                joins,
+                count_joins,
+                filters
+            )
+
+        load_columns = self._list_load_columns
+        if load and load_columns is not None and self.column_list_rows:
+            query = query.with_entities(*[getattr(self.model, c) for c in load_columns])
+        elif load:
+            if load_columns is not None:
+                query = query.options(load_only(*load_columns))
+            if self._list_loader_options:
+                query = query.options(*self._list_loader_options)
+
+        return query, count_query, joins
+
+    def get_one(self, id):
+        """
+        Overwrite flask_admin.contrib.sqla.ModelView.get_one
+        预加载详情字段中的关联字段
+        """
+        query = self.session.query(self.model)
+        if self._details_loader_options:
+            query = query.options(*self._details_loader_options)
+        return query.get(tools.iterdecode(id))
+
+    def delete_models(self, ids):
+        """
+        一条查询加载所有记录，批量调用删除钩子后在一个事务中删除。
+        重载了 delete_model（如软删除、审计）时逐个调用 delete_model
+        """
+        if type(self).delete_model is not ModelView.delete_model:
+            return super(ModelView, self).delete_models(ids)
+
+        keys = OrderedDict()
+        missing = []
+        for id in ids:
+            key = self._get_pk_key(id)
+            if key is None:
+                missing.append(id)
+            elif key not in keys:
+                keys[key] = id
+        if not keys:
+            return [], missing, {}
+
+        if isinstance(self._primary_key, tuple):
+            query_ids = list(keys.values())
+        else:
+            query_ids = [key[0] for key in keys]
+        found = {}
+        for model in get_query_for_ids(self.get_query(), self.model, query_ids):
+            found[self._get_pk_key(self.get_pk_value(model))] = model
+        missing.extend(id for key, id in keys.items() if key not in found)
+        models = [found[key] for key in keys if key in found]
+        if not models:
+            return [], missing, {}
+
+        ids_by_pk = dict((self.get_pk_value(model), keys[key]) for key, model in found.items())
+        try:
+            failures = self.on_models_delete(models)
+            models = [model for model in models if self.get_pk_value(model) not in failures]
+            self.session.flush()
+            for model in models:
+                self.session.delete(model)
+            self.session.commit()
+        except Exception as ex:
+            self.session.rollback()
+            msg = gettext('Failed to delete record. %(error)s', error=str(ex))
+            return [], missing, dict((id, msg) for id in ids_by_pk.values())
+
+        self.after_models_delete(models)
+        if models:
+            self.invalidate_cache()
+        deleted = [ids_by_pk[self.get_pk_value(model)] for model in models]
+        failures = dict((ids_by_pk.get(pk, pk), msg) for pk, msg in failures.items())
+        return deleted, missing, failures
+
+    def on_models_delete(self, models):
+        """
+        每条记录的 on_model_delete 在一个 SAVEPOINT 中执行，出错时只回滚该记录的改动
+        """
+        failures = {}
+        for model in models:
+            try:
+                with self.session.begin_nested():
+                    self.on_model_delete(model)
+            except Exception as ex:
+                failures[self.get_pk_value(model)] = gettext('Failed to delete record. %(error)s', error=str(ex))
+        return failures
+
+    def _get_pk_key(self, id):
+        """
+        将请求中的 ID 或 get_pk_value 的结果转换为主键取值的元组，用于比较，无法转换时返回 None
+        """
+        values = tools.iterdecode(id) if isinstance(id, str) else (id,)
+        columns = self.model.__mapper__.primary_key
+        if len(values) != len(columns):
+            return None
+        key = []
+        for column, value in zip(columns, values):
+            try:
+                python_type = column.type.python_type
+            except NotImplementedError:
+                python_type = None
+            try:
+                if python_type in (int, float, decimal.Decimal):
+                    value = python_type(value)
+                else:
+                    value = str(value)
+            except (TypeError, ValueError, decimal.InvalidOperation):
+                return None
+            key.append(value)
+        return tuple(key)
+
+    def get_list(self, page, sort_column, sort_desc, search, filters,
+                 execute=True, page_size=None):
+        """
+        Overwrite flask_admin.contrib.sqla.ModelView.get_list
+        """
+        query, count_query, joins = self._build_list_query(search, filters)
+
+        count = self._get_list_count(count_query, search, filters)
+
+        if sort_column is None and search and self._search_supported:
+            backend = self._get_ready_search_backend(search)
+            if backend is not None:
+                query = query.order_by(backend.rank(search))
+        query, joins = self._apply_sorting(query, joins, sort_column, sort_desc)
+        query = self._apply_pagination(query, page, page_size)
+
+        if execute:
+            query = query.all()
+
+        return count, query
+
+    def iter_list_data(self, data):
+        if hasattr(data, 'yield_per') and self._list_yield_per:
+            return iter(data.yield_per(self.list_stream_batch))
+        return iter(data)
+
+    def load_filter_options(self, filters):
+        """
+        取不同值作为选项的 FilterInList 用一条 UNION ALL 查询读取
+        """
+        columns = {}
+        others = {}
+        for name, flt in filters.items():
+            if isinstance(flt, FilterInList) and flt.options is None:
+                columns[name] = flt.column
+            else:
+                others[name] = flt
+        result = super(ModelView, self).load_filter_options(others)
+        if columns:
+            result.update(self.load_distinct_options(columns))
+        return result
+
+    def load_distinct_options(self, columns):
+        """
+        读取字段在列表数据中的不同取值，columns 为 {name: column}，返回 {name: options}
+        """
+        result = dict((name, []) for name in columns)
+        union_names = self._get_union_option_names(columns)
+        for name, column in columns.items():
+            if name in union_names:
+                continue
+            query = self.get_query().with_entities(column).filter(column.isnot(None))
+            query = query.group_by(column).order_by(column).limit(self.filter_options_limit)
+            result[name] = [(value, value) for value, in query]
+        if not union_names:
+            return result
+
+        queries = []
+        for name in union_names:
+            column = columns[name]
+            query = self.get_query().with_entities(
+                literal(name).label('name'),
+                cast(column, String).label('value')
+            )
+            query = query.filter(column.isnot(None)).group_by(column).order_by(column)
+            subquery = query.limit(self.filter_options_limit).subquery()
+            queries.append(self.session.query(subquery.c.name, subquery.c.value))
+
+        query = queries[0].union_all(*queries[1:])
+        for name, value in query:
+            value = self._load_option_value(columns[name], value)
+            result[name].append((value, value))
+        return result
+
+    @expose('/ajax/facets/', methods=['GET', 'POST'])
+    def ajax_facets(self):
+        """
+        多个字段在当前搜索、过滤条件下出现最多的取值及数量
+        """
+        columns = json.loads(request.values.get('columns') or '[]')
+        limit = request.values.get('limit', self.facet_limit, type=int)
+        limit = min(limit, self.filter_options_limit)
+        search, filters = self._get_facet_args()
+        facets = self.get_facets(columns, search, filters, limit)
+        return jsonify(dict(code=0, msg='', data=facets))
+
+    @expose('/ajax/', methods=['POST'])
+    def ajax_post(self):
+        """
+        表头数据接口，开启 filter_facets 时取值跟随当前的搜索、过滤条件
+        """
+        if not self.filter_facets:
+            return super(ModelView, self).ajax_post()
+
+        columns = json.loads(request.form['columns'])
+        search, filters = self._get_facet_args()
+        facets = self.get_facets(columns, search, filters, self.filter_options_limit)
+        result = dict((name, [v for v, _ in values]) for name, values in facets.items())
+
+        others = [c for c in columns if c not in facets]
+        for column, options in self.get_filter_options(others).items():
+            result[column] = [o[0] for o in options]
+        return jsonify(result)
+
+    def _get_facet_args(self):
+        search = request.values.get('search') or None
+        filter_sos = request.values.get('filterSos')
+        filters = json.loads(filter_sos) if filter_sos else None
+        return search, filters
+
+    def get_facets(self, names, search, filters, limit):
+        """
+        统计多个字段的取值，只统计可过滤的表字段。
+        每个字段的取值不受该字段自身的过滤条件影响，过滤条件相同的字段用一条 UNION ALL 查询
+
+        :return: {name: [(value, count)]}，按数量降序
+        """
+        groups = OrderedDict()
+        for name in names:
+            if not self._filters or name not in self._filters:
+                continue
+            if isinstance(self.model.__mapper__.attrs.get(name), ColumnProperty):
+                column_filters = exclude_filter_field(filters, name) if filters else filters
+                key = json.dumps(column_filters, sort_keys=True, default=str)
+                group = groups.setdefault(key, (column_filters, OrderedDict()))
+                group[1][name] = getattr(self.model, name)
+
+        result = {}
+        for column_filters, columns in groups.values():
+            result.update(self._get_facets(columns, search, column_filters, limit))
+        return result
+
+    def _get_facets(self, columns, search, filters, limit):
+        result = dict((name, []) for name in columns)
+        query, _, _ = self._build_list_query(search, filters, count=False, load=False)
+        union_names = self._get_union_option_names(columns)
+        for name, column in columns.items():
+            if name in union_names:
+                continue
+            count = func.count('*')
+            facet_query = query.with_entities(column, count)
+            facet_query = facet_query.group_by(column).order_by(desc(count), column)
+            result[name] = [(value, count) for value, count in facet_query.limit(limit)]
+        if not union_names:
+            return result
+
+        queries = []
+        for name in union_names:
+            column = columns[name]
+            count = func.count('*')
+            facet_query = query.with_entities(
+                literal(name).label('name'),
+                cast(column, String).label('value'),
+                count.label('count')
+            )
+            facet_query = facet_query.group_by(column).order_by(desc(count), column)
+            subquery = facet_query.limit(limit).subquery()
+            queries.append(self.session.query(subquery.c.name, subquery.c.value, subquery.c.count))
+
+        query = queries[0].union_all(*queries[1:])
+        for name, value, count in query:
+            result[name].append((self._load_option_value(columns[name], value), count))
+        return result
+
+    def _get_union_option_names(self, columns):
+        """
+        可以合并为一条 UNION ALL 查询的字段：转换为字符串后能还原为原类型的字段。
+        日期、枚举等其他类型的字段单独查询，保持取值类型与列表数据一致
+        """
+        names = []
+        for name, column in columns.items():
+            try:
+                python_type = column.type.python_type
+            except (AttributeError, NotImplementedError):
+                continue
+            if python_type in (str, bool, int, float, decimal.Decimal):
+                names.append(name)
+        return names if len(names) > 1 else []
+
+    def _load_option_value(self, column, value):
+        """
+        将转换为字符串的取值还原为字段类型
+        """
+        if value is None:
+            return value
+        try:
+            python_type = column.type.python_type
+        except (AttributeError, NotImplementedError):
+            return value
+        if python_type is bool:
+            return value.lower() in ('1', 'true', 't')
+        if python_type in (int, float, decimal.Decimal):
+            try:
+                return python_type(value)
+            except (ValueError, decimal.InvalidOperation):
+                pass
+        return value
+
+    def _get_list_count(self, count_query, search, filters):
+        """
+        按 count_strategy 计算列表总数
+        """
+        if count_query is None or self.count_strategy == COUNT_HAS_MORE:
+            return None
+
+        if self.count_strategy == COUNT_ESTIMATE and not search and not filters:
+            count = self.get_estimated_count()
+            if count is not None:
+                return count
+
+        if self.count_strategy == COUNT_CACHED:
+            key = self.get_count_cache_key(search, filters)
+            count = self._count_cache.get(key)
+            if count is None:
+                count = count_query.scalar()
+                self._count_cache.set(key, count)
+            return count
+
+        return count_query.scalar()
+
+    def invalidate_cache(self):
+        super(ModelView, self).invalidate_cache()
+        self._count_cache.clear()
+
+    def has_shared_model_version(self):
+        """
+        模型版本号保存在 admin_data_version 表中，
+        每个进程检查一次表是否存在，不存在时版本号只在进程内有效
+        """
+        if self._version_table is None:
+            return False
+        if self._has_version_table is None:
+            table = self._version_table
+            conn = self.session.connection(mapper=self.model.__mapper__)
+            self._has_version_table = conn.dialect.has_table(conn, table.name, schema=table.schema)
+            if not self._has_version_table:
+                if self.list_cache_size:
+                    print('Warning: table {} does not exist, data changes will not invalidate cached '
+                          'list responses of other processes. Please create it with db.create_all() '
+                          'or a migration.'.format(table.name))
+        return self._has_version_table
+
+    def _get_version_name(self):
+        return self.model.__mapper__.local_table.name
+
+    def get_model_version(self):
+        if not self.has_shared_model_version():
+            return super(ModelView, self).get_model_version()
+        table = self._version_table
+        query = select([table.c.version]).where(table.c.name == self._get_version_name())
+        return self.session.execute(query).scalar() or 0
+
+    def bump_model_version(self):
+        """
+        在数据变更提交后递增共享的版本号，使所有进程缓存的列表数据失效
+        """
+        super(ModelView, self).bump_model_version()
+        if not self.has_shared_model_version():
+            return
+        table = self._version_table
+        name = self._get_version_name()
+        update = table.update().where(table.c.name == name).values(version=table.c.version + 1)
+        if not self.session.execute(update).rowcount:
+            try:
+                self.session.execute(table.insert().values(name=name, version=1))
+                self.session.commit()
+                return
+            except IntegrityError:
+                # 其他进程同时插入了该行
+                self.session.rollback()
+                self.session.execute(update)
+        self.session.commit()
+
+    def get_count_cache_key(self, search, filters):
+        """
+        缓存总数的键，默认包含请求路径（租户、关联模型 ID）、搜索及过滤条件。
+        如果 get_query 与当前用户相关，需要重载
+        """
+        return (request.path, search, json.dumps(filters, sort_keys=True, default=str))
+
+    def get_estimated_count(self):
+        """
+        从数据库统计信息中读取估算的行数，不支持的数据库返回 None
+        """
+        table = getattr(self.model, '__table__', None)
+        if table is None:
+            return None
+
+        dialect = self.session.get_bind(mapper=self.model.__mapper__).dialect.name
+        if dialect == 'postgresql':
+            stmt = text('SELECT reltuples FROM pg_class WHERE oid = CAST(:name AS regclass)')
+            count = self.session.execute(stmt, {'name': table.fullname}).scalar()
+        elif dialect == 'mysql':
+            stmt = text(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = :name'
+            )
+            count = self.session.execute(stmt, {'name': table.name}).scalar()
+        else:
+            return None
+
+        if count is None or count < 0:
+            return None
+        return int(count)
+
+    def _get_keyset_fields(self, sort_column, sort_desc):
+        """
+        游标分页的排序键：不需要关联查询的排序字段 + 主键
+        """
+        sort_field = None
+        if sort_column is not None:
+            sort_field = self._get_keyset_sort_field(sort_column)
+            if sort_field is None:
+                raise ValueError('Column {} can not be sorted with keyset pagination'.format(sort_column))
+        else:
+            for field, joins, direction in self._get_default_order():
+                if not joins:
+                    sort_field, sort_desc = field, direction
+                break
+
+        pk_field = getattr(self.model, self._primary_key)
+        if not isinstance(sort_field, InstrumentedAttribute) or sort_field is pk_field:
+            return [pk_field], bool(sort_desc)
+        return [sort_field, pk_field], bool(sort_desc)
+
+    def _get_keyset_sort_field(self, sort_column):
+        """
+        可用于游标分页的排序字段：不需要关联查询的模型字段，否则返回 None
+        """
+        if sort_column in self._sortable_joins:
+            return None
+        sort_field = self._sortable_columns.get(sort_column)
+        if not isinstance(sort_field, InstrumentedAttribute):
+            return None
+        return sort_field
+
+    def is_list_sortable(self, name):
+        if self.keyset_pagination and self._get_keyset_sort_field(name) is None:
+            return False
+        return super(ModelView, self).is_list_sortable(name)
+
+    def get_keyset_list(self, cursor, sort_column, sort_desc, search, filters,
+                        page_size=None):
+        """
+        游标分页，查询耗时与翻页深度无关。排序字段应为非空字段
+
+        :return: (data, next_cursor, prev_cursor)
+        """
+        if page_size is None:
+            page_size = self.page_size
+
+        query, _, joins = self._build_list_query(search, filters, count=False)
+        fields, sort_desc = self._get_keyset_fields(sort_column, sort_desc)
+
+        direction, key = CURSOR_NEXT, None
+        if cursor:
+            direction, key = decode_cursor(cursor, fields, sort_desc)
+        backward = direction == CURSOR_PREV
+        descending = sort_desc != backward
+
+        if key is not None:
+            query = query.filter(keyset_condition(fields, key, descending))
+        query = query.order_by(*[desc(f) if descending else f for f in fields])
+        if page_size:
+            query = query.limit(page_size + 1)
+
+        data = query.all()
+        has_more = bool(page_size) and len(data) > page_size
+        if has_more:
+            data = data[:page_size]
+        if backward:
+            data.reverse()
+
+        def _cursor(direction, row):
+            return encode_cursor(direction, [getattr(row, f.key) for f in fields], fields, sort_desc)
+
+        next_cursor = prev_cursor = None
+        if data:
+            if has_more or (backward and key is not None):
+                next_cursor = _cursor(CURSOR_NEXT, data[-1])
+            if (has_more and backward) or (not backward and key is not None):
+                prev_cursor = _cursor(CURSOR_PREV, data[0])
+
+        return data, next_cursor, prev_cursor
+
     def create_blueprints(self, admin):
         blueprints = []
         for key in self.model_relationship_views:
@@ -1,25 +1,45 @@
+import hashlib
 import json
 import os
+import time
 import uuid
 
 from datetime import datetime, date
-from flask import request, jsonify, get_flashed_messages, abort, send_from_directory, redirect
+from flask import request, jsonify, get_flashed_messages, abort, send_from_directory, redirect, current_app
+from flask import json as flask_json, Response, stream_with_context
 from flask_admin import tools, expose
 from flask_admin.helpers import get_redirect_target
 from flask_admin.model import BaseModelView as _BaseModelView
 from flask_admin.model.base import ViewArgs as _ViewArgs
 from flask_admin.model.filters import BaseFilter
 from flask_admin.babel import gettext
+from flask_admin.tools import rec_getattr
+from flask_login import current_user
 from fairy_admin.tenant import TenantAdmin
 from markupsafe import Markup
 from math import ceil
 from wtforms import form
 
 from fairy_admin.actions import ActionsMixin
+from fairy_admin.cache import TTLCache, data_versions
+from fairy_admin.consts import COUNT_EXACT, COUNT_HAS_MORE
+from fairy_admin.stats import get_filter_fields
+
+try:
+    from flask_babelex import get_locale
+except ImportError:
+    def get_locale():
+        return None
 
 from .fields import UnboundField
 
 
+BOOL_ICONS = {
+    True: Markup('<i class="layui-icon layui-icon-ok"></i>'),
+    False: Markup('<i class="layui-icon layui-icon-close"></i>'),
+}
+
+
 class ViewArgs(_ViewArgs):
     def __init__(self, *args, **kwargs):
         super(ViewArgs, self).__init__(*args, **kwargs)
@@ -51,6 +71,74 @@ class BaseModelViewMixin(ActionsMixin):
     """
     control display of actions column on table of model list
     """
+    column_actions_compact = True
+    """
+    send row action definitions once in table config and encode allowed
+    actions of each row as a bitmask, the table script expands them
+    """
+    keyset_pagination = False
+    """
+    paginate table of model list with cursors derived from the sort column
+    and primary key instead of page offsets, total count is not displayed
+    """
+    count_strategy = COUNT_EXACT
+    """
+    control how total count of model list is calculated:
+    'exact' runs count query on every request,
+    'cached' caches exact count by search and filter arguments for count_cache_ttl seconds,
+    'estimate' uses estimated row count of database when search and filters are empty,
+    only use it if get_query is not restricted,
+    'has_more' fetches one more row instead of counting and omits total count
+    """
+    count_cache_ttl = 60
+    """
+    seconds to cache total count of model list when count_strategy is 'cached'
+    """
+    list_max_rows = 1000
+    """
+    hard limit of rows in one response of model list data, also applies
+    when page size is 0, set to None to disable
+    """
+    list_stream = False
+    """
+    stream model list data as JSON in batches of list_stream_batch rows
+    instead of serializing the whole page in memory
+    """
+    list_stream_batch = 100
+    """
+    number of rows fetched and serialized at a time when list_stream is enabled
+    """
+    config_cache_ttl = 300
+    """
+    seconds to cache table config of model list per permission set and locale,
+    clients revalidate it by ETag
+    """
+    filter_options_cache_ttl = 300
+    """
+    seconds to cache options of column filters, the cache is cleared
+    when the view creates, edits or deletes rows
+    """
+    list_cache_size = 0
+    """
+    number of ajax list responses cached per view, keyed by permission set,
+    page, sort, search and filters, 0 disables the cache.
+    Cached pages are invalidated when a view of the same model creates, edits,
+    deletes rows or runs an action, or get_data_version changes
+    """
+    list_cache_ttl = None
+    """
+    seconds to keep a cached ajax list response. None keeps it until invalidated
+    when get_data_version is overridden, otherwise pages expire after
+    list_cache_default_ttl, since writes made outside the admin do not change
+    the model version
+    """
+    list_cache_default_ttl = 60
+    list_columnar = False
+    """
+    let the table script request model list data in columnar format:
+    field names once in `fields` and one array of values per row in `rows`,
+    instead of one object per row in `data`
+    """
 
     def __init__(self, *args, **kwargs):
         super(BaseModelViewMixin, self).__init__(*args, **kwargs)
@@ -61,6 +149,10 @@ class BaseModelViewMixin(ActionsMixin):
         if date_formatter is None:
             self.column_type_formatters[date] = self._date_formatter
         self.column_type_formatters[bool] = self._bool_formatter
+        self._list_formatters = None
+        self._config_cache = TTLCache(ttl=self.config_cache_ttl)
+        self._filter_options_cache = TTLCache(ttl=self.filter_options_cache_ttl)
+        self._list_cache = None
 
     def _datetime_formatter(self, view, value):
         datetime_format = getattr(self, 'datetime_format', '%Y-%m-%d %H:%M:%S')
@@ -71,8 +163,7 @@ class BaseModelViewMixin(ActionsMixin):
         return value.strftime(date_format)
 
     def _bool_formatter(self, view, value):
-        icon = 'ok' if value else 'close'
-        return Markup('<i class="layui-icon layui-icon-{}"></i>'.format(icon))
+        return BOOL_ICONS[bool(value)]
 
     def _get_list_filter_args(self):
         if self.admin.template_mode == 'layui':
@@ -83,6 +174,73 @@ class BaseModelViewMixin(ActionsMixin):
     def _repr(self, value):
         return value
 
+    def _refresh_cache(self):
+        super(BaseModelViewMixin, self)._refresh_cache()
+        self._list_formatters = None
+
+    def _get_list_formatters(self):
+        """
+        每个列表字段编译后的格式化函数 [(name, formatter)]，formatter(model) 返回单元格的值
+        """
+        if self._list_formatters is None:
+            type_formatters = {}
+            self._list_formatters = [
+                (c, self._compile_list_formatter(c, type_formatters))
+                for c, _ in self._list_columns
+            ]
+        return self._list_formatters
+
+    def _compile_list_formatter(self, name, type_formatters):
+        """
+        预先解析字段的格式化函数、选项映射，按值的类型缓存类型格式化函数，
+        与 get_list_value 的结果相同
+        """
+        view_class = type(self)
+        if view_class.get_list_value is not _BaseModelView.get_list_value \
+                or view_class._get_list_value is not _BaseModelView._get_list_value:
+            return lambda model: self._repr(self.get_list_value(None, model, name))
+
+        column_fmt = self.column_formatters.get(name)
+        choices_map = self._column_choices_map.get(name)
+        column_type_formatters = self.column_type_formatters
+        _repr = self._repr
+
+        if column_fmt is not None:
+            def get_value(model):
+                return column_fmt(self, None, model, name)
+        elif view_class._get_field_value is not _BaseModelView._get_field_value:
+            def get_value(model):
+                return self._get_field_value(model, name)
+        elif '.' in name:
+            def get_value(model):
+                return rec_getattr(model, name)
+        else:
+            def get_value(model):
+                return getattr(model, name, None)
+
+        if choices_map:
+            def formatter(model):
+                value = get_value(model)
+                return _repr(choices_map.get(value) or value)
+            return formatter
+
+        def formatter(model):
+            value = get_value(model)
+            value_type = type(value)
+            try:
+                type_fmt = type_formatters[value_type]
+            except KeyError:
+                type_fmt = None
+                for typeobj, fmt in column_type_formatters.items():
+                    if isinstance(value, typeobj):
+                        type_fmt = fmt
+                        break
+                type_formatters[value_type] = type_fmt
+            if type_fmt is not None:
+                value = type_fmt(self, value)
+            return _repr(value)
+        return formatter
+
     def _refresh_filters_cache(self):
         self._filters = self.get_filters()
 
@@ -109,10 +267,57 @@ class BaseModelViewMixin(ActionsMixin):
         kwargs['get_label'] = self.get_column_name
         return super(BaseModelViewMixin, self).render(template, **kwargs)
 
+    def _get_cache_fingerprint(self):
+        """
+        区分缓存与 ETag 的请求路径、语言及当前用户的权限集合
+        """
+        locale = get_locale()
+        if locale is None:
+            # 未使用 flask_babelex 时按请求的语言区分
+            locale = request.headers.get('Accept-Language', '')
+        fingerprint = [request.path, str(locale)]
+        if self.admin.rbac is not None:
+            fingerprint.append(self.admin.rbac.get_permissions().fingerprint)
+        elif getattr(current_app, 'login_manager', None) is not None:
+            # 没有权限集合时，can_create 等可能按用户设置，按用户区分
+            fingerprint.append(current_user.get_id())
+        return fingerprint
+
+    def _make_etag(self, *args):
+        data = json.dumps(args, default=str, separators=(',', ':'))
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def _make_conditional(self, response):
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
     @expose('/ajax/config/')
     def ajax_config(self):
         """
-        LayUI 的数据表配置接口
+        LayUI 的数据表配置接口，按权限集合与语言缓存，支持 ETag
+        """
+        key = tuple(self._get_cache_fingerprint())
+        cached = self._config_cache.get(key)
+        if cached is None:
+            body = flask_json.dumps(self.get_ajax_config())
+            cached = (body, self._make_etag(body))
+            self._config_cache.set(key, cached)
+
+        body, etag = cached
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        return self._make_conditional(response)
+
+    def is_list_sortable(self, name):
+        """
+        数据表中该字段是否可以排序，数据后端可以重载以排除游标分页不支持的字段
+        """
+        return self.is_sortable(name)
+
+    def get_ajax_config(self):
+        """
+        LayUI 的数据表配置
         """
         limits = [self.page_size]
         if self.can_set_page_size:
@@ -124,19 +329,20 @@ class BaseModelViewMixin(ActionsMixin):
 
         display_checkbox, actions = self.get_actions_list()
 
+        filter_options = self.get_filter_options([c for c, _ in self._list_columns])
+
         columns = []
         for c, name in self._list_columns:
             column = {
                 'field': c,
-                'sort': self.is_sortable(c),
+                'sort': self.is_list_sortable(c),
                 'title': name,
                 'description': self.column_descriptions.get(c),
             }
             if self._filters and c in self._filters:
                 column['filter'] = True
-                flt = self._filters[c]
-                if isinstance(flt, BaseFilter):
-                    column['options'] = flt.get_options(self)
+                if c in filter_options:
+                    column['options'] = filter_options[c]
 
             columns.append(column)
 
@@ -167,11 +373,17 @@ class BaseModelViewMixin(ActionsMixin):
             'column_display_checkbox': display_checkbox,
             'column_display_actions': display_actions,
             'column_actions_width': self.column_actions_width,
+            'keyset': self.keyset_pagination,
+            'count_strategy': self.count_strategy,
+            'columnar': self.list_columnar,
         }
+        if self.column_display_actions and self.column_actions_compact:
+            row_actions = self._get_row_action_names()
+            result['row_actions'] = [self._actions_data[name].convert() for name in row_actions]
         if self.can_export:
             result['export_url'] = self.get_url('.export', export_type='<export_type>')
 
-        return jsonify(result)
+        return result
 
     def is_accessible(self):
         if self.admin.rbac is None:
@@ -190,7 +402,7 @@ class BaseModelViewMixin(ActionsMixin):
     def _get_list_extra_args(self):
         extra_args = {}
         for k, v in request.args.items():
-            if k in ('page', 'limit', 'field', 'desc', 'search', 'filterSos'):
+            if k in ('page', 'limit', 'field', 'desc', 'search', 'filterSos', 'cursor', 'format'):
                 continue
             if k.startswith('flt'):
                 continue
@@ -217,16 +429,172 @@ class BaseModelViewMixin(ActionsMixin):
     @expose('/ajax/', methods=['GET'])
     def ajax(self):
         """
-        LayUI 的数据表数据接口
+        LayUI 的数据表数据接口，支持 ETag
+        """
+        data_version = self.get_data_version()
+        if data_version is None:
+            response = self._get_list_response()
+            if not response.is_streamed:
+                response.add_etag()
+            return self._make_conditional(response)
+
+        etag = self._make_etag(self._get_cache_fingerprint(), request.full_path, data_version)
+        if request.if_none_match.contains(etag):
+            response = Response()
+        else:
+            response = self._get_list_response(data_version)
+        response.set_etag(etag)
+        if isinstance(data_version, datetime):
+            response.last_modified = data_version
+        return self._make_conditional(response)
+
+    def get_data_version(self):
+        """
+        列表数据的版本，例如最后修改时间，任何数据变更后都必须改变，用于生成列表数据的 ETag。
+        默认返回 None，按响应内容生成 ETag
         """
+        return None
+
+    def _get_list_response(self, data_version=None):
+        cache_key = None
+        if self._get_list_cache() is not None:
+            cache_key = self.get_list_cache_key(data_version)
+            body = self._list_cache.get(cache_key)
+            if body is not None:
+                return Response(body, mimetype='application/json')
 
         view_args = self._get_list_extra_args()
+        started = time.time()
+        response = self._query_list_response(view_args)
+        if response.is_streamed:
+            # 流式输出时查询在生成响应的过程中执行，输出完成后再记录耗时
+            response.response = self._iter_list_stats(response.response, view_args, started)
+        else:
+            self._record_list_stats(view_args, time.time() - started)
+
+        if cache_key is not None and response.status_code == 200 and not response.is_streamed:
+            self._list_cache.set(cache_key, response.get_data())
+        return response
+
+    def _get_list_cache(self):
+        """
+        第一次使用时创建列表数据缓存。管理后台之外的数据变更不会改变模型版本号，
+        未设置 list_cache_ttl 且未重载 get_data_version 时使用 list_cache_default_ttl
+        """
+        if self._list_cache is None and self.list_cache_size:
+            ttl = self.list_cache_ttl
+            if ttl is None and type(self).get_data_version is BaseModelViewMixin.get_data_version:
+                ttl = self.list_cache_default_ttl
+                if not self.has_shared_model_version():
+                    print('Warning: model version of {} is not shared between processes, cached list '
+                          'responses of other processes expire after {} seconds'.format(self.endpoint, ttl))
+            self._list_cache = TTLCache(maxsize=self.list_cache_size, ttl=ttl)
+        return self._list_cache
+
+    def get_list_cache_key(self, data_version):
+        """
+        缓存列表数据的键，默认包含请求路径、语言、权限集合（没有 RBAC 时为用户 ID）、
+        请求参数及数据版本，权限集合相同的用户共享缓存。
+        如果 get_query 与当前用户相关，需要重载
+        """
+        args = tuple(sorted(request.args.items(multi=True)))
+        version = self.get_model_version()
+        return (tuple(self._get_cache_fingerprint()), args, version, data_version)
+
+    def has_shared_model_version(self):
+        """
+        模型版本号是否在多个进程间共享，数据后端可以重载
+        """
+        return False
+
+    def get_model_version(self):
+        """
+        模型数据的版本号，数据变更后递增，默认只在进程内有效
+        """
+        return data_versions.get(getattr(self, 'model', None))
+
+    def bump_model_version(self):
+        data_versions.bump(getattr(self, 'model', None))
+
+    def get_list_cache_info(self):
+        """
+        列表数据缓存的命中次数、未命中次数与条目数，未开启时返回 None
+        """
+        if self._list_cache is None:
+            return None
+        return dict(
+            hits=self._list_cache.hits,
+            misses=self._list_cache.misses,
+            size=len(self._list_cache),
+            maxsize=self._list_cache.maxsize
+        )
+
+    def _iter_list_stats(self, body, view_args, started):
+        for chunk in body:
+            yield chunk
+        self._record_list_stats(view_args, time.time() - started)
+
+    def _record_list_stats(self, view_args, elapsed):
+        """
+        配置了 FAIRY_ADMIN_STATS_FILE 时，记录过滤、排序字段组合的耗时
+        """
+        stats = getattr(self.admin, 'stats', None)
+        if stats is None:
+            return
+        sort_column = self._get_column_by_idx(view_args.sort)
+        if sort_column is not None:
+            sort_column = sort_column[0]
+        filters = get_filter_fields(view_args.filters)
+        stats.record(self.endpoint, filters, sort_column, view_args.search, elapsed)
 
+    def _query_list_response(self, view_args):
         sort_column = self._get_column_by_idx(view_args.sort)
         if sort_column is not None:
             sort_column = sort_column[0]
 
-        page_size = view_args.page_size or self.page_size
+        page_size = self._get_list_page_size(view_args.page_size)
+
+        if self.keyset_pagination:
+            try:
+                data, next_cursor, prev_cursor = self.get_keyset_list(
+                    request.args.get('cursor'),
+                    sort_column,
+                    view_args.sort_desc,
+                    view_args.search,
+                    view_args.filters,
+                    page_size=page_size
+                )
+            except ValueError:
+                abort(400)
+
+            result = {
+                'code': 0,
+                'msg': '',
+                'page_size': page_size,
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor,
+            }
+            return self._make_list_response(result, data)
+
+        if self.count_strategy == COUNT_HAS_MORE:
+            _, query = self.get_list(
+                view_args.page - 1,
+                sort_column,
+                view_args.sort_desc,
+                view_args.search,
+                view_args.filters,
+                execute=False,
+                page_size=page_size
+            )
+            data = query.limit(page_size + 1).all()
+            result = {
+                'code': 0,
+                'msg': '',
+                'has_more': len(data) > page_size,
+                'page_size': page_size,
+                'page': view_args.page,
+            }
+            return self._make_list_response(result, data[:page_size])
 
         count, data = self.get_list(
             view_args.page - 1,
@@ -234,6 +602,7 @@ class BaseModelViewMixin(ActionsMixin):
             view_args.sort_desc,
             view_args.search,
             view_args.filters,
+            execute=not self.list_stream,
             page_size=page_size
         )
 
@@ -244,22 +613,6 @@ class BaseModelViewMixin(ActionsMixin):
         else:
             num_pages = None
 
-        list_columns = self._list_columns
-        page = []
-        for row in data:
-            item = {
-                '_id': self.get_pk_value(row)
-            }
-            for c, name in list_columns:
-                item[c] = self._repr(self.get_list_value(None, row, c))
-
-            pk = self.get_pk_value(row)
-
-            if self.column_display_actions:
-                row_actions = self._get_list_row_actions(row)
-                item['_actions'] = [action.convert() for action in row_actions]
-            page.append(item)
-
         result = {
             'code': 0,
             'msg': '',
@@ -267,10 +620,119 @@ class BaseModelViewMixin(ActionsMixin):
             'num_pages': num_pages,
             'page_size': page_size,
             'page': view_args.page,
-            'data': page,
         }
+        return self._make_list_response(result, data)
 
-        return jsonify(result)
+    def _get_list_page_size(self, page_size):
+        """
+        请求的分页大小，不超过 list_max_rows
+        """
+        page_size = page_size or self.page_size
+        if self.list_max_rows and (not page_size or page_size > self.list_max_rows):
+            page_size = self.list_max_rows
+        return page_size
+
+    def _make_list_response(self, result, data):
+        """
+        输出列表数据，开启 list_stream 时分批查询并序列化
+        """
+        if request.args.get('format') == 'columnar':
+            fields = self._get_list_fields()
+            result['fields'] = fields
+            key = 'rows'
+
+            def _get_rows(data):
+                return [[item[f] for f in fields] for item in self._get_list_rows(data)]
+        else:
+            key = 'data'
+            _get_rows = self._get_list_rows
+
+        if not self.list_stream:
+            result[key] = _get_rows(data)
+            return jsonify(result)
+
+        def generate():
+            yield '{},"{}":['.format(flask_json.dumps(result)[:-1], key)
+            sep = ''
+            for rows in self._iter_list_batches(data):
+                for item in _get_rows(rows):
+                    yield sep + flask_json.dumps(item)
+                    sep = ','
+            yield ']}'
+
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
+    def _iter_list_batches(self, data):
+        batch = []
+        for row in self.iter_list_data(data):
+            batch.append(row)
+            if len(batch) >= self.list_stream_batch:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def iter_list_data(self, data):
+        """
+        逐行读取 get_list(execute=False) 返回的查询，数据后端可以重载以分批读取
+        """
+        return iter(data)
+
+    def _get_list_fields(self):
+        """
+        列式数据中每行的字段名，与 _get_list_rows 的行数据对应
+        """
+        fields = ['_id'] + [c for c, _ in self._list_columns]
+        if self.column_display_actions:
+            fields.append('_action_mask' if self.column_actions_compact else '_actions')
+        return fields
+
+    def _get_list_rows(self, data):
+        """
+        将一页数据转换为 LayUI 数据表的行数据
+        """
+        formatters = self._get_list_formatters()
+        if self.column_display_actions:
+            row_action_names = self._get_row_action_names()
+            if self.column_actions_compact:
+                row_masks = self.model_can_do_actions(data, row_action_names)
+            else:
+                rows_actions = self._get_list_rows_actions(data, row_action_names)
+
+        page = []
+        for idx, row in enumerate(data):
+            item = {
+                '_id': self.get_pk_value(row)
+            }
+            for c, formatter in formatters:
+                item[c] = formatter(row)
+
+            if self.column_display_actions:
+                if self.column_actions_compact:
+                    item['_action_mask'] = self._encode_action_mask(row_masks[idx])
+                else:
+                    item['_actions'] = [action.convert() for action in rows_actions[idx]]
+            page.append(item)
+        return page
+
+    def get_keyset_list(self, cursor, sort_column, sort_desc, search, filters,
+                        page_size=None):
+        """
+        游标分页，由具体的数据后端实现
+
+        :return: (data, next_cursor, prev_cursor)
+        """
+        raise NotImplementedError('Please implement get_keyset_list method')
+
+    def _encode_action_mask(self, mask):
+        """
+        第 n 位表示是否允许 ajax_config 中 row_actions 的第 n 个动作
+        """
+        result = 0
+        for idx, allowed in enumerate(mask):
+            if allowed:
+                result |= 1 << idx
+        return result
 
     @expose('/ajax/', methods=['POST'])
     def ajax_post(self):
@@ -281,14 +743,78 @@ class BaseModelViewMixin(ActionsMixin):
         # tableFilterType = request.form.get('tableFilterType')
         columns = json.loads(columns)
         result = {}
-        for column in columns:
-            if column in self._filters:
-                flt = self._filters[column]
-                if isinstance(flt, BaseFilter):
-                    result[column] = [o[0] for o in flt.get_options(self)]
+        filter_options = self.get_filter_options(columns)
+        for column, options in filter_options.items():
+            result[column] = [o[0] for o in options]
 
         return jsonify(result)
 
+    def get_filter_options(self, names):
+        """
+        获取多个过滤字段的选项，返回 {name: options}，只包含有选项的过滤器
+        """
+        prefix = self.get_filter_options_cache_key()
+        result = {}
+        filters = {}
+        for name in names:
+            flt = self._filters.get(name) if self._filters else None
+            if not isinstance(flt, BaseFilter):
+                continue
+            options = self._filter_options_cache.get((prefix, name))
+            if options is None:
+                filters[name] = flt
+            else:
+                result[name] = options
+
+        if filters:
+            loaded = self.load_filter_options(filters)
+            for name in filters:
+                options = list(loaded.get(name) or [])
+                self._filter_options_cache.set((prefix, name), options)
+                result[name] = options
+        return result
+
+    def get_filter_options_cache_key(self):
+        """
+        缓存过滤器选项的键，默认为请求路径（租户、关联模型 ID）。
+        如果 get_query 与当前用户相关，需要重载
+        """
+        return request.path
+
+    def load_filter_options(self, filters):
+        """
+        读取过滤器的选项，filters 为 {name: filter}，数据后端可以重载以合并查询
+        """
+        return dict((name, flt.get_options(self)) for name, flt in filters.items())
+
+    def create_model(self, form):
+        model = super(BaseModelViewMixin, self).create_model(form)
+        if model:
+            self.invalidate_cache()
+        return model
+
+    def update_model(self, form, model):
+        result = super(BaseModelViewMixin, self).update_model(form, model)
+        if result:
+            self.invalidate_cache()
+        return result
+
+    def delete_model(self, model):
+        result = super(BaseModelViewMixin, self).delete_model(model)
+        if result:
+            self.invalidate_cache()
+        return result
+
+    def invalidate_cache(self):
+        """
+        数据变更（创建、编辑、删除、执行动作）后调用，清除视图缓存的列表数据
+        """
+        self.bump_model_version()
+        self._config_cache.clear()
+        self._filter_options_cache.clear()
+        if self._list_cache is not None:
+            self._list_cache.clear()
+
     @expose('/ajax/new/', methods=['POST'])
     def ajax_create_view(self):
         """
@@ -365,14 +891,54 @@ class BaseModelViewMixin(ActionsMixin):
 
         data = request.json
 
-        for id in data.get('ids', []):
-            model = self.get_one(id)
+        deleted, missing, failures = self.delete_models(data.get('ids', []))
+        result = dict(code=0, msg='', deleted=deleted, missing=missing)
+        if failures:
+            result['code'] = 500
+            result['msg'] = '\n'.join(failures.values())
+            result['failed'] = [dict(id=id, msg=msg) for id, msg in failures.items()]
+        return jsonify(result)
+
+    def delete_models(self, ids):
+        """
+        批量删除，数据后端可以重载为在一个事务中删除
+
+        :return: (deleted, missing, failures)，failures 为 {id: 错误信息}
+        """
+        deleted = []
+        missing = []
+        failures = {}
+        for id in ids:
+            # ID 与视图 URL 中的一样按字符串处理
+            model = self.get_one(id if isinstance(id, str) else str(id))
             if model is None:
-                continue
-            if not self.delete_model(model):
-                return jsonify(dict(code=500, msg='Unknown error.'))
+                missing.append(id)
+            elif self.delete_model(model):
+                deleted.append(id)
+            else:
+                failures[id] = gettext('Failed to delete record. %(error)s', error='')
+        return deleted, missing, failures
+
+    def on_models_delete(self, models):
+        """
+        批量删除前调用，默认逐个调用 on_model_delete
 
-        return jsonify(dict(code=0, msg=''))
+        :return: {id: 错误信息}，出错的记录不会被删除
+        """
+        failures = {}
+        for model in models:
+            try:
+                self.on_model_delete(model)
+            except Exception as ex:
+                failures[self.get_pk_value(model)] = gettext('Failed to delete record. %(error)s', error=str(ex))
+        return failures
+
+    def after_models_delete(self, models):
+        """
+        批量删除提交后调用，默认逐个调用 after_model_delete
+        """
+        for model in models:
+            self.after_model_delete(model)
 
     def get_form(self, form_name=None):
         """
@@ -1,6 +1,8 @@
 import click
 
-from flask import Blueprint, request, url_for, render_template, jsonify, redirect
+from collections import OrderedDict
+
+from flask import Blueprint, g, request, url_for, render_template, jsonify, redirect
 from flask_admin import AdminIndexView
 from flask_admin.babel import gettext
 from flask_admin.helpers import get_redirect_target
@@ -8,23 +10,29 @@ from flask_admin.model.helpers import prettify_name
 from flask_security import Security, current_user, SQLAlchemyUserDatastore
 from flask_security.utils import verify_password, login_user, logout_user
 from flask_login import LoginManager
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 from .views import UserView, RoleView, PermissionView
-from .mixins import UserMixin, RoleMixin, PermissionMixin
+from .mixins import UserMixin, RoleMixin, PermissionMixin, VersionMixin
+from .permissions import Grants, PermissionSet
 
 
 class RBAC(SQLAlchemyUserDatastore):
 
     LOGIN_TEMPLATE = 'rbac/login.html'
 
-    def __init__(self, db, user_model=None, role_model=None, permission_model=None, name=None, description=None):
+    def __init__(self, db, user_model=None, role_model=None, permission_model=None, name=None, description=None, version_model=None):
         self.db = db
         self.User = user_model
         self.Role = role_model
         self.Permission = permission_model
+        self.Version = version_model
         self.name = name
         self.description = description
         self.security = Security(register_blueprint=False)
+        self._grants_cache = {}
+        self._has_version_table = None
 
         if self.Permission is None:
             class Permission(db.Model, PermissionMixin):
@@ -53,6 +61,10 @@ class RBAC(SQLAlchemyUserDatastore):
                 db.Column('role_id', db.Integer, db.ForeignKey(self.Role.id))
             )
             self.User.roles = db.relationship(self.Role, secondary=user_role_table)
+        if self.Version is None:
+            class Version(db.Model, VersionMixin):
+                pass
+            self.Version = Version
 
         super(RBAC, self).__init__(db, self.User, self.Role)
 
@@ -61,6 +73,7 @@ class RBAC(SQLAlchemyUserDatastore):
 
         # app.config['SECURITY_LOGIN_USER_TEMPLATE'] = self.LOGIN_TEMPLATE
         self.security.init_app(app, datastore=self)
+        app.login_manager.user_loader(self.load_user)
 
         blueprint = Blueprint(endpoint, __name__, cli_group='rbac')
         blueprint.add_url_rule('/login', endpoint='login_view', view_func=self.login_view, methods=['GET'])
@@ -80,18 +93,143 @@ class RBAC(SQLAlchemyUserDatastore):
         self.admin = admin
 
     def has_permission(self, permission_code):
-        alt_permission_codes = [permission_code]
-        items = permission_code.split('.')
-        while items:
-            items[-1] = '*'
-            alt_permission_codes.append('.'.join(items))
-            items = items[:-1]
-
-        for role in current_user.roles:
-            for permission in role.permissions:
-                if permission.code in alt_permission_codes:
-                    return True
-        return False
+        return permission_code in self.get_permissions()
+
+    def has_permissions(self, permission_codes):
+        """
+        批量检查权限，返回与 permission_codes 一一对应的布尔列表
+        """
+        return self.get_permissions().match_many(permission_codes)
+
+    def get_permissions(self):
+        """
+        获取当前用户编译后的权限集合
+        """
+        return self.get_grants().permissions
+
+    def get_grants(self):
+        """
+        获取当前用户的角色码与权限集合，每个请求只加载一次
+        """
+        if not current_user.is_authenticated:
+            return Grants(None, frozenset(), PermissionSet())
+        return self._get_user_grants(current_user)
+
+    def load_user(self, user_id):
+        """
+        Flask-Login 的 user_loader，加载用户的同时加载其角色码与权限码
+        """
+        query = self.User.query.options(joinedload(self.User.roles))
+        user = query.filter_by(id=user_id).first()
+        if user is not None:
+            self._get_user_grants(user)
+        return user
+
+    def _get_user_grants(self, user):
+        grants = g.get('_rbac_grants')
+        if grants is None or grants.user_id != user.id:
+            grants = self._load_grants(user.id)
+            g._rbac_grants = grants
+        return grants
+
+    def _load_grants(self, user_id):
+        """
+        版本号未变化时跨请求复用，否则用一条查询取出角色码与权限码。
+        没有版本号表时无法得知其他进程的变更，只在当前请求内复用
+        """
+        shared = self.has_version_table()
+        version = self.get_version()
+        cached = self._grants_cache.get(user_id)
+        if shared and cached is not None and cached[0] == version:
+            return cached[1]
+
+        query = self.db.session.query(self.Role.code, self.Permission.code)
+        query = query.select_from(self.User).filter(self.User.id == user_id)
+        query = query.join(self.User.roles).outerjoin(self.Role.permissions)
+        role_codes = set()
+        permission_codes = set()
+        for role_code, permission_code in query:
+            role_codes.add(role_code)
+            if permission_code is not None:
+                permission_codes.add(permission_code)
+
+        grants = Grants(user_id, frozenset(role_codes), PermissionSet(permission_codes))
+        if shared:
+            self._grants_cache[user_id] = (version, grants)
+        return grants
+
+    def get_version(self):
+        """
+        获取角色权限数据的版本号，每个请求只查询一次
+        """
+        version = g.get('_rbac_version')
+        if version is None:
+            version = 0
+            if self.has_version_table():
+                query = self.db.session.query(self.Version.version)
+                version = query.filter_by(id=1).scalar() or 0
+            g._rbac_version = version
+        return version
+
+    def has_version_table(self):
+        """
+        版本号表是否已创建，每个进程只检查一次。
+        升级后未创建该表时版本号视为 0，权限缓存只在本进程内失效
+        """
+        if self._has_version_table is None:
+            table = self.Version.__table__
+            conn = self.db.session.connection(mapper=self.Version.__mapper__)
+            self._has_version_table = conn.dialect.has_table(conn, table.name, schema=table.schema)
+            if not self._has_version_table:
+                print('Warning: table {} does not exist, permission changes will not be '
+                      'synchronized between processes. Please create it with db.create_all() '
+                      'or a migration.'.format(table.name))
+        return self._has_version_table
+
+    def bump_version(self):
+        """
+        角色、权限及其关联变更时调用，和变更在同一个事务中提交后，
+        所有进程缓存的权限集合都会失效
+        """
+        if not self.has_version_table():
+            self.invalidate_permissions()
+            return
+        query = self.Version.query.filter_by(id=1)
+        updated = query.update(
+            {self.Version.version: self.Version.version + 1},
+            synchronize_session=False
+        )
+        if not updated:
+            try:
+                with self.db.session.begin_nested():
+                    self.db.session.add(self.Version(id=1, version=1))
+            except IntegrityError:
+                # 其他进程同时插入了该行
+                query.update(
+                    {self.Version.version: self.Version.version + 1},
+                    synchronize_session=False
+                )
+        self.invalidate_permissions()
+
+    def add_role_to_user(self, user, role):
+        added = super(RBAC, self).add_role_to_user(user, role)
+        if added:
+            self.bump_version()
+        return added
+
+    def remove_role_from_user(self, user, role):
+        removed = super(RBAC, self).remove_role_from_user(user, role)
+        if removed:
+            self.bump_version()
+        return removed
+
+    def invalidate_permissions(self):
+        """
+        清除当前进程中已编译的权限集合
+        """
+        self._grants_cache.clear()
+        g.pop('_rbac_grants', None)
+        g.pop('_rbac_version', None)
 
     def login_view(self):
         next_url = request.args.get('next', '')
@@ -130,7 +268,7 @@ class RBAC(SQLAlchemyUserDatastore):
         ModelView = model_view or PermissionView
         return ModelView(self.Permission, session, **kwargs)
 
-    def generate_permissions(self):
+    def _collect_permissions(self):
         permission_codes= []
         for tenant_admin, _ in self.admin._tenant_admins:
             permission_code = '{}.*'.format(tenant_admin.endpoint)
@@ -173,23 +311,62 @@ class RBAC(SQLAlchemyUserDatastore):
                 permission_name = view._prettify_name(permission_code)
                 permission_codes.append((permission_code, permission_name))
 
-        for permission_code, permission_name in permission_codes:
-            query = self.Permission.query.filter_by(code=permission_code)
-            permission = query.one_or_none()
-            if permission is None:
-                permission = self.Permission(code=permission_code)
-                self.db.session.add(permission)
-            permission.name = permission_name
-
-        to_delete_permissions = []
-        permission_codes = [p[0] for p in permission_codes]
-        for permission in self.Permission.query.all():
-            if permission.code not in permission_codes:
-                to_delete_permissions.append(permission)
-
-        for permission in to_delete_permissions:
-            self.db.session.delete(permission)
+        return permission_codes
+
+    @click.option('--dry-run', is_flag=True, help='Print changes without applying them.')
+    def generate_permissions(self, dry_run=False):
+        permissions = OrderedDict(self._collect_permissions())
+
+        existing = {}
+        to_delete = []
+        query = self.db.session.query(self.Permission.id, self.Permission.code, self.Permission.name)
+        for permission_id, permission_code, permission_name in query.order_by(self.Permission.id):
+            if permission_code in permissions and permission_code not in existing:
+                existing[permission_code] = (permission_id, permission_name)
+            else:
+                to_delete.append((permission_id, permission_code))
+
+        to_insert = []
+        to_update = []
+        updated_codes = []
+        for permission_code, permission_name in permissions.items():
+            if permission_code not in existing:
+                to_insert.append(dict(code=permission_code, name=permission_name))
+                continue
+            permission_id, old_name = existing[permission_code]
+            if old_name != permission_name:
+                to_update.append(dict(id=permission_id, name=permission_name))
+                updated_codes.append(permission_code)
+
+        if dry_run:
+            for item in to_insert:
+                click.echo('+ {code} ({name})'.format(**item))
+            for permission_code, item in zip(updated_codes, to_update):
+                click.echo('~ {} ({})'.format(permission_code, item['name']))
+            for permission_id, permission_code in to_delete:
+                click.echo('- {}'.format(permission_code))
+            click.echo('{} to insert, {} to update, {} to delete.'.format(
+                len(to_insert), len(to_update), len(to_delete)
+            ))
+            return
 
+        if to_insert:
+            self.db.session.bulk_insert_mappings(self.Permission, to_insert)
+        if to_update:
+            self.db.session.bulk_update_mappings(self.Permission, to_update)
+        if to_delete:
+            ids = [permission_id for permission_id, _ in to_delete]
+            secondary = self.Role.permissions.property.secondary
+            if secondary is not None:
+                permission_table = self.Permission.__table__
+                for column in secondary.c:
+                    if any(fk.references(permission_table) for fk in column.foreign_keys):
+                        self.db.session.execute(secondary.delete().where(column.in_(ids)))
+            query = self.Permission.query.filter(self.Permission.id.in_(ids))
+            query.delete(synchronize_session=False)
+
+        if to_insert or to_update or to_delete:
+            self.bump_version()
         self.db.session.commit()
 
     @click.argument('mobile')
@@ -240,6 +417,7 @@ class RBAC(SQLAlchemyUserDatastore):
             return
 
         user.roles.append(role)
+        self.bump_version()
         self.db.session.commit()
 
     @click.argument('username')
@@ -261,4 +439,5 @@ class RBAC(SQLAlchemyUserDatastore):
             role = self.Role(name='admin', code='admin')
             self.db.session.add(role)
         role.permissions.append(permission)
+        self.bump_version()
         self.db.session.commit()
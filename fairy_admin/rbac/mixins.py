@@ -53,3 +53,14 @@ class PermissionMixin(object):
     description = Column(String(1024))
     create_at = Column(DateTime, default=datetime.now)
     update_at = Column(DateTime, onupdate=datetime.now)
+
+
+class VersionMixin(object):
+    """
+    角色、权限及其关联变更时递增版本号，用于多进程间同步权限缓存
+    """
+    __tablename__ = 'admin_rbac_version'
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    update_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
@@ -0,0 +1,83 @@
+import hashlib
+
+from collections import namedtuple
+
+
+Grants = namedtuple('Grants', ['user_id', 'role_codes', 'permissions'])
+"""
+用户的角色码与编译后的权限集合，不持有 ORM 对象
+"""
+
+
+class PermissionTrie(object):
+    """
+    按 `.` 分段的权限码前缀树
+
+    `a.b.*` 匹配所有以 `a.b.` 开头的权限码，`*` 匹配全部权限码，
+    匹配耗时只与权限码的层级数相关
+    """
+    WILDCARD = '*'
+    _TERMINAL = None
+
+    def __init__(self, codes=()):
+        self.root = {}
+        for code in codes:
+            self.add(code)
+
+    def add(self, code):
+        node = self.root
+        for item in code.split('.'):
+            node = node.setdefault(item, {})
+        node[self._TERMINAL] = True
+
+    def match(self, code):
+        node = self.root
+        for item in code.split('.'):
+            wildcard = node.get(self.WILDCARD)
+            if wildcard is not None and self._TERMINAL in wildcard:
+                return True
+            node = node.get(item)
+            if node is None:
+                return False
+        return self._TERMINAL in node
+
+
+class PermissionSet(object):
+    """
+    编译后的用户权限集合
+    """
+    def __init__(self, codes=()):
+        self.codes = frozenset(code for code in codes if code)
+        self.trie = PermissionTrie(self.codes)
+        self._fingerprint = None
+
+    def __contains__(self, permission_code):
+        if permission_code in self.codes:
+            return True
+        return self.trie.match(permission_code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def fingerprint(self):
+        """
+        权限码集合的摘要，权限相同的用户摘要相同
+        """
+        if self._fingerprint is None:
+            data = '\n'.join(sorted(self.codes)).encode('utf-8')
+            self._fingerprint = hashlib.sha1(data).hexdigest()
+        return self._fingerprint
+
+    def match_many(self, permission_codes):
+        """
+        批量检查权限码，返回与 permission_codes 一一对应的布尔列表
+        """
+        results = {}
+        mask = []
+        for permission_code in permission_codes:
+            result = results.get(permission_code)
+            if result is None:
+                result = results[permission_code] = permission_code in self
+            mask.append(result)
+        return mask
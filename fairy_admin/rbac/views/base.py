@@ -0,0 +1,17 @@
+
+from fairy_admin.contrib.sqla import ModelView
+
+
+class RBACModelView(ModelView):
+    """
+    角色、权限、用户变更时递增 RBAC 版本号，使各进程缓存的权限集合失效
+    """
+    def on_model_change(self, form, model, is_created):
+        self._bump_version()
+
+    def on_model_delete(self, model):
+        self._bump_version()
+
+    def _bump_version(self):
+        if self.admin.rbac is not None:
+            self.admin.rbac.bump_version()
@@ -1,8 +1,8 @@
 
-from fairy_admin.contrib.sqla import ModelView
+from .base import RBACModelView
 
 
-class PermissionView(ModelView):
+class PermissionView(RBACModelView):
     create_modal = True
     edit_modal = True
 
@@ -1,8 +1,8 @@
 
-from fairy_admin.contrib.sqla import ModelView
+from .base import RBACModelView
 
 
-class RoleView(ModelView):
+class RoleView(RBACModelView):
     create_modal = True
     edit_modal = True
 
@@ -1,7 +1,7 @@
-from fairy_admin.contrib.sqla import ModelView
+from .base import RBACModelView
 
 
-class UserView(ModelView):
+class UserView(RBACModelView):
     create_modal = True
     edit_modal = True
 
@@ -75,7 +75,53 @@ layui.define(["jquery", "laytpl", "table", "soulTable", "layer", "upload", "form
         }
     }
 
+    function expandRowActions(rowActions, mask) {
+        var actions = [];
+        for (var idx = 0; idx < rowActions.length; idx++) {
+            if (Math.floor(mask / Math.pow(2, idx)) % 2 === 1) {
+                actions.push(rowActions[idx]);
+            }
+        }
+        return actions;
+    }
+
+    function expandColumnar(fields, rows) {
+        var data = [];
+        for (var idx = 0; idx < rows.length; idx++) {
+            var row = rows[idx];
+            var item = {};
+            for (var col = 0; col < fields.length; col++) {
+                item[fields[col]] = row[col];
+            }
+            data.push(item);
+        }
+        return data;
+    }
+
+    function renderCursorPager(_id, tableConfig, pageConfig, cursors) {
+        // 游标分页只提供上一页、下一页
+        var view = $("[lay-id=\"" + _id + "\"]");
+        var pager = $("<div class=\"layui-table-page\"><div class=\"layui-box layui-laypage layui-laypage-default\"></div></div>");
+        var buttons = [["prev", pageConfig.prev, cursors.prev], ["next", pageConfig.next, cursors.next]];
+        buttons.forEach(function(item) {
+            var button = $("<a href=\"javascript:;\"></a>").addClass("layui-laypage-" + item[0]).text(item[1]);
+            if (item[2]) {
+                button.on("click", function() {
+                    table.reload(_id, {
+                        where: $.extend({}, tableConfig.where, {cursor: item[2]})
+                    });
+                });
+            } else {
+                button.addClass("layui-disabled");
+            }
+            pager.children().append(button);
+        });
+        view.find(".layui-table-page").remove();
+        view.append(pager);
+    }
+
     function renderTable(_id, elem, toolbar, config, cols, height=null) {
+        var cursors = {};
         function optionName(key) {
             var value = key[this.field];
             for (var idx in this.options) {
@@ -97,15 +143,48 @@ layui.define(["jquery", "laytpl", "table", "soulTable", "layer", "upload", "form
             toolbar: toolbar,
             defaultToolbar: config.default_tool_bar,
             url: config.url,
-            page: config.page,
+            where: config.columnar ? {format: "columnar"} : {},
+            page: config.keyset ? false : config.page,
             cols: [cols],
             soulSort: false,
             height: height,
             filter: {
                 items: ["data", "condition", "editCondition"]
             },
+            parseData: function(res) {
+                // 列式数据只传一次字段名，展开为行对象
+                if (res.fields && res.rows) {
+                    res.data = expandColumnar(res.fields, res.rows);
+                    delete res.rows;
+                }
+                // 行内动作以位掩码传输，按表格配置中的 row_actions 展开
+                if (config.row_actions && res.data) {
+                    for (var idx in res.data) {
+                        var item = res.data[idx];
+                        if (item._action_mask !== undefined) {
+                            item._actions = expandRowActions(config.row_actions, item._action_mask);
+                        }
+                    }
+                }
+                if (config.keyset) {
+                    cursors = {next: res.next_cursor, prev: res.prev_cursor};
+                }
+                if (res.has_more !== undefined) {
+                    // 不统计总数时，仅保证“下一页”可用
+                    var offset = (res.page - 1) * res.page_size + res.data.length;
+                    res.count = offset + (res.has_more ? 1 : 0);
+                }
+                return res;
+            },
             done: function() {
                 soulTable.render(this);
+                if (config.keyset) {
+                    // table.reload 会深度合并 where，游标只用于本次翻页，之后的排序、筛选、搜索从第一页开始
+                    if (this.where && this.where.cursor) {
+                        this.where.cursor = "";
+                    }
+                    renderCursorPager(_id, this, config.page, cursors);
+                }
                 // 修复由 soulTable 导致的表格高度问题
                 var filterHeight = $("[lay-id=\"" + _id + "\"]").find(".soul-bottom-contion").outerHeight();
                 if (filterHeight) {
@@ -117,6 +196,10 @@ layui.define(["jquery", "laytpl", "table", "soulTable", "layer", "upload", "form
                     }
                 }
 
+                if (config.count_strategy === "has_more") {
+                    $("[lay-id=\"" + _id + "\"] .layui-laypage-count").hide();
+                }
+
                 // TODO check language, english only
                 var total = $("[lay-id=\"" + _id + "\"] .layui-laypage-count").text();
                 if (!total) {
@@ -187,7 +270,8 @@ layui.define(["jquery", "laytpl", "table", "soulTable", "layer", "upload", "form
                         table.reload(_id, {
                             where: {
                                 field: obj.field,
-                                order: obj.type
+                                order: obj.type,
+                                cursor: ""
                             }
                         });
                     });
@@ -0,0 +1,205 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from sqlalchemy.orm import RelationshipProperty
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def get_filter_fields(filter_sos):
+    """
+    filterSos 中用到的字段名，去重并排序
+    """
+    fields = set()
+
+    def _walk(children):
+        for filter_so in children or []:
+            if filter_so.get('mode') == 'group':
+                _walk(filter_so.get('children'))
+            elif filter_so.get('field'):
+                fields.add(filter_so['field'])
+
+    if isinstance(filter_sos, list):
+        _walk(filter_sos)
+    return tuple(sorted(fields))
+
+
+class ListStats(object):
+    """
+    各视图列表查询的过滤字段、排序字段组合的调用次数与耗时，
+    在内存中累计，每隔 flush_interval 秒及进程退出时合并写入本地文件
+    """
+    def __init__(self, path, flush_interval=60):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._data = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.time()
+        atexit.register(self.flush)
+
+    def record(self, endpoint, filters, sort, search, elapsed):
+        """
+        记录一次列表查询，elapsed 单位为秒
+        """
+        key = (endpoint, tuple(filters), sort, bool(search))
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                item = self._data[key] = [0, 0.0, 0.0]
+            item[0] += 1
+            item[1] += elapsed
+            item[2] = max(item[2], elapsed)
+            flush = time.time() - self._flushed_at >= self.flush_interval
+
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """
+        将内存中的统计合并写入文件
+        """
+        with self._lock:
+            data, self._data = self._data, {}
+            self._flushed_at = time.time()
+        if not data:
+            return
+
+        with self._file_lock():
+            merged = self._merge(self.load(), data)
+            tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+            with open(tmp_path, 'w') as f:
+                json.dump(self._dump(merged), f)
+            os.replace(tmp_path, self.path)
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        多个进程读取、合并、写入统计文件时加锁，避免后写入的进程覆盖其他进程的统计
+        """
+        if fcntl is None:
+            yield
+            return
+        with open('{}.lock'.format(self.path), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load(self):
+        """
+        读取文件中的统计，{key: [count, total, max]}
+        """
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            items = json.load(f)
+        result = {}
+        for item in items:
+            key = (item['endpoint'], tuple(item['filters']), item['sort'], item['search'])
+            result[key] = [item['count'], item['total'], item['max']]
+        return result
+
+    def get_data(self):
+        """
+        文件与内存中尚未写入的统计之和
+        """
+        with self._lock:
+            data = dict((k, list(v)) for k, v in self._data.items())
+        return self._merge(self.load(), data)
+
+    def _merge(self, data, other):
+        for key, (count, total, max_elapsed) in other.items():
+            item = data.get(key)
+            if item is None:
+                data[key] = [count, total, max_elapsed]
+            else:
+                item[0] += count
+                item[1] += total
+                item[2] = max(item[2], max_elapsed)
+        return data
+
+    def _dump(self, data):
+        items = []
+        for (endpoint, filters, sort, search), (count, total, max_elapsed) in data.items():
+            items.append({
+                'endpoint': endpoint,
+                'filters': list(filters),
+                'sort': sort,
+                'search': search,
+                'count': count,
+                'total': total,
+                'max': max_elapsed,
+            })
+        return items
+
+
+def resolve_column(model, field_name):
+    """
+    按关联字段解析字段路径，返回对应的表字段，无法解析时返回 None
+    """
+    names = field_name.split('.')
+    for name in names[:-1]:
+        prop = model.__mapper__.attrs.get(name)
+        if not isinstance(prop, RelationshipProperty):
+            return None
+        model = prop.mapper.class_
+    prop = model.__mapper__.attrs.get(names[-1])
+    columns = getattr(prop, 'columns', None)
+    if not columns or not hasattr(columns[0], 'table'):
+        return None
+    return columns[0]
+
+
+def is_indexed(column):
+    """
+    字段是否是某个索引（含主键、唯一约束）的第一个字段
+    """
+    table = column.table
+    if list(table.primary_key.columns)[:1] == [column]:
+        return True
+    for index in table.indexes:
+        if list(index.columns)[:1] == [column]:
+            return True
+    for constraint in table.constraints:
+        columns = getattr(constraint, 'columns', None)
+        if constraint is not table.primary_key and columns is not None and list(columns)[:1] == [column]:
+            return True
+    return False
+
+
+def advise_indexes(data, views, min_count=1, min_time=0.0):
+    """
+    找出调用次数不少于 min_count、平均耗时不少于 min_time 秒，
+    且过滤或排序字段缺少索引的组合，按总耗时降序
+
+    :param views: {endpoint: view}
+    :return: [(key, [count, total, max], missing_columns)]
+    """
+    result = []
+    for key, stat in data.items():
+        endpoint, filters, sort, search = key
+        count, total, max_elapsed = stat
+        if count < min_count or total / count < min_time:
+            continue
+        model = getattr(views.get(endpoint), 'model', None)
+        if model is None or not hasattr(model, '__mapper__'):
+            continue
+
+        missing = []
+        for field_name in list(filters) + ([sort] if sort else []):
+            column = resolve_column(model, field_name)
+            if column is not None and not is_indexed(column) and column not in missing:
+                missing.append(column)
+        if missing:
+            result.append((key, stat, missing))
+
+    result.sort(key=lambda item: item[1][1], reverse=True)
+    return result
@@ -60,6 +60,7 @@ class TenantAdmin(AdminMixin, Admin):
             **kwargs
         )
         self.rbac = None
+        self.stats = None
         self._add_return_link(
             return_name,
             endpoint=return_endpoint,
@@ -102,6 +103,7 @@ class TenantAdmin(AdminMixin, Admin):
         self.admin = admin
         self.template_mode = admin.template_mode
         self.rbac = admin.rbac
+        self.stats = admin.stats
         for view in self._views:
             blueprint = view.create_blueprint(self)
             blueprint.url_value_preprocessor(self._url_value_preprocessor)